@@ -10,6 +10,14 @@ import {MockPositionValue as PositionValue} from "./uniswap/v3/mocks/libraries/M
 contract UniswapV3LPFullBacktest is UniswapV3LPBacktest {
     constructor(address _manager) UniswapV3LPBacktest(_manager) {}
 
+    /// @notice Replaces the LP token ids owned by this contract with the given token id
+    /// @dev Drops positions burned on rebalance so values only reads the live position
+    /// @param tokenId The token id of the live LP position
+    function replace(uint256 tokenId) external {
+        delete tokenIds;
+        tokenIds.push(tokenId);
+    }
+
     /// @notice Reports the principal, fee (token0, token1) values of the LP tokens owned by this contract
     /// @return values_ The current (token0, token1) principal, fee of the LP tokens owned by this contract
     function values() public view virtual override returns (uint256[] memory values_) {
@@ -1,8 +1,9 @@
-from .runners import UniswapV3LPFullRunner, UniswapV3LPSimpleRunner, UniswapV3LPOptimizedRunner
+from .runners import UniswapV3LPFullRunner, UniswapV3LPSimpleRunner, UniswapV3LPOptimizedRunner, UniswapV3LPMultiRunner
 
 
 __all__ = [
     "UniswapV3LPFullRunner",
     "UniswapV3LPSimpleRunner",
     "UniswapV3LPOptimizedRunner",
+    "UniswapV3LPMultiRunner",
 ]
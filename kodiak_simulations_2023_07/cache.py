@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from collections import namedtuple
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from ape.contracts import ContractInstance
+
+
+@lru_cache(maxsize=None)
+def _struct(fields: Tuple[str, ...]) -> type:
+    """
+    Namedtuple class standing in for an ape struct output with the given fields.
+    """
+    return namedtuple("Struct", fields, rename=True)
+
+
+def _encode(value: Any) -> Any:
+    """
+    Encodes a contract call return value as JSON serializable, keeping big ints lossless.
+    """
+    if hasattr(value, "__dataclass_fields__"):  # ape struct outputs
+        fields = list(value.__dataclass_fields__)
+        return {"fields": fields, "values": [_encode(getattr(value, f)) for f in fields]}
+    elif isinstance(value, bytes):
+        return {"bytes": value.hex()}
+    elif isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    """
+    Decodes a contract call return value encoded with _encode. Structs decode
+    to namedtuples so support the same attribute and tuple access.
+    """
+    if isinstance(value, dict) and "fields" in value:
+        return _struct(tuple(value["fields"]))(*[_decode(v) for v in value["values"]])
+    elif isinstance(value, dict) and "bytes" in value:
+        return bytes.fromhex(value["bytes"])
+    elif isinstance(value, list):
+        return tuple(_decode(v) for v in value)
+    return value
+
+
+# persistent cache of reference contract calls keyed by block
+class RefCallCache:
+    """
+    Content-addressed, on-disk SQLite cache of view calls on reference contracts.
+
+    Entries are keyed by the hash of (chain id, contract address, method, args, block),
+    so are immutable for any historical block. Calls with block None are treated as
+    immutable metadata (e.g. fee, tickSpacing). Least recently used entries are evicted
+    once the cache holds more than max_size entries. Access times of hits are kept in
+    memory and written back every flush_accesses hits in one short transaction, so no
+    write lock is held between writes. Safe to share across threads and processes.
+    """
+
+    def __init__(self, path: str, chain_id: int, max_size: int = 1000000, flush_accesses: int = 1000):
+        dirname = os.path.dirname(path)
+        if dirname != "":
+            os.makedirs(dirname, exist_ok=True)
+
+        self.path = path
+        self.chain_id = chain_id
+        self.max_size = max_size
+        self.flush_accesses = flush_accesses
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS calls (key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS calls_accessed ON calls (accessed)")
+        self._conn.commit()
+
+        (self._size, accessed) = self._conn.execute("SELECT COUNT(*), MAX(accessed) FROM calls").fetchone()
+        self._accessed = accessed if accessed is not None else 0
+        self._accessed_pending: Dict[str, int] = {}  # key => access time of hits not yet written back
+        self._inserts = 0  # inserts since size last counted
+
+    def _key(self, address: str, method: str, args: Tuple, block: Optional[int]) -> str:
+        """
+        Content address of the call.
+        """
+        data = json.dumps([self.chain_id, address.lower(), method, _encode(args), block])
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _count(self):
+        """
+        Re-counts entries, as other processes sharing the cache file insert and evict too.
+        """
+        self._size = self._conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+        self._inserts = 0
+
+    def _evict(self):
+        """
+        Evicts least recently used entries in batches of a tenth of max_size
+        to amortize the cost of deletes.
+        """
+        count = self._size - self.max_size + self.max_size // 10
+        cursor = self._conn.execute(
+            "DELETE FROM calls WHERE key IN (SELECT key FROM calls ORDER BY accessed LIMIT ?)",
+            (count,),
+        )
+        self._size -= cursor.rowcount
+        self.evictions += cursor.rowcount
+
+    def _write_accessed(self):
+        """
+        Writes back pending access times of hits. Caller commits.
+        """
+        if len(self._accessed_pending) == 0:
+            return
+
+        self._conn.executemany(
+            "UPDATE calls SET accessed = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._accessed_pending.items()],
+        )
+        self._accessed_pending = {}
+
+    def get(self, contract: ContractInstance, method: str, *args: Any, block: Optional[int] = None) -> (bool, Any):
+        """
+        Gets cached result of view method call on contract at block.
+
+        Returns:
+            found (bool): Whether the call is cached.
+            value (Any): The call result if found, otherwise None.
+        """
+        key = self._key(contract.address, method, args, block)
+        with self._lock:
+            self._accessed += 1
+            row = self._conn.execute("SELECT value FROM calls WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return (False, None)
+
+            self.hits += 1
+            self._accessed_pending[key] = self._accessed
+            if len(self._accessed_pending) >= self.flush_accesses:
+                self._write_accessed()
+                self._conn.commit()
+
+        return (True, _decode(json.loads(row[0])))
+
+    def put(self, contract: ContractInstance, method: str, *args: Any, block: Optional[int] = None, result: Any) -> Any:
+        """
+        Caches result of view method call on contract at block.
+
+        Returns:
+            Any: The result as it would be returned from the cache.
+        """
+        key = self._key(contract.address, method, args, block)
+        value = _encode(result)
+        with self._lock:
+            self._accessed += 1
+            self._write_accessed()
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO calls (key, value, accessed) VALUES (?, ?, ?)",
+                (key, json.dumps(value), self._accessed),
+            )
+            if cursor.rowcount == 0:
+                # @dev already cached, e.g. by another process since the miss
+                self._conn.execute(
+                    "UPDATE calls SET value = ?, accessed = ? WHERE key = ?", (json.dumps(value), self._accessed, key)
+                )
+            else:
+                self._size += 1
+                self._inserts += 1
+
+            if self._size > self.max_size or self._inserts >= self.max_size // 10:
+                self._count()
+            if self._size > self.max_size:
+                self._evict()
+
+            self._conn.commit()
+
+        return _decode(value)
+
+    def call(self, contract: ContractInstance, method: str, *args: Any, block: Optional[int] = None) -> Any:
+        """
+        Calls view method on contract at block, returning cached result if any.
+
+        Args:
+            contract (:class:`ape.contracts.ContractInstance`): The reference contract.
+            method (str): The view method name.
+            block (Optional[int]): The block number. If None, result is cached as immutable.
+
+        Returns:
+            Any: The call result.
+        """
+        (found, value) = self.get(contract, method, *args, block=block)
+        if found:
+            return value
+
+        fn = getattr(contract, method)
+        result = fn(*args) if block is None else fn(*args, block_identifier=block)
+        return self.put(contract, method, *args, block=block, result=result)
+
+    def flush(self):
+        """
+        Writes back and commits any pending access time updates.
+        """
+        with self._lock:
+            self._write_accessed()
+            self._conn.commit()
+
+    def close(self):
+        """
+        Commits and closes the underlying connection.
+        """
+        with self._lock:
+            self._write_accessed()
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,53 @@
+import json
+import os
+
+from typing import Mapping
+
+
+def checkpoint_path(path: str) -> str:
+    """
+    Path to the checkpoint for the backtest writing records to path.
+
+    Args:
+        path (str): The path to the file backtest records are written to.
+    """
+    return f"{path}.checkpoint.json"
+
+
+def write_checkpoint(path: str, data: Mapping):
+    """
+    Atomically writes checkpoint data as JSON to path, so a crash mid-write
+    leaves the prior checkpoint intact. Big ints are kept lossless.
+
+    Args:
+        path (str): The path to the checkpoint file.
+        data (Mapping): The checkpoint data.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp, path)
+
+    # fsync the directory so the rename itself is durable
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_checkpoint(path: str) -> Mapping:
+    """
+    Reads checkpoint data from path.
+
+    Args:
+        path (str): The path to the checkpoint file.
+
+    Returns:
+        Mapping: The checkpoint data.
+    """
+    with open(path, "r") as f:
+        return json.load(f)
@@ -1,3 +1,5 @@
 # univ3 tick constants
 MIN_TICK = -887272
 MAX_TICK = 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
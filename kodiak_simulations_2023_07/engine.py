@@ -0,0 +1,138 @@
+from typing import List, Mapping, Optional
+
+from .utils import (
+    get_amount0_for_liquidity,
+    get_amount1_for_liquidity,
+    get_sqrt_ratio_at_tick,
+    get_tick_at_sqrt_ratio,
+)
+
+
+_UINT256_MOD = 1 << 256
+
+
+class EngineRevertError(Exception):
+    """
+    Raised by a native engine where the backtester contract it ports would revert.
+    """
+
+
+def get_fee_growth_inside(
+    tick_current: int,
+    tick_lower: int,
+    tick_upper: int,
+    fee_growth_global_x128: int,
+    fee_growth_outside_lower_x128: int,
+    fee_growth_outside_upper_x128: int,
+) -> int:
+    """
+    Port of MockPositionValue._getFeeGrowthInside for a single token, wrapping as unchecked uint256.
+    """
+    if tick_current < tick_lower:
+        inside = fee_growth_outside_lower_x128 - fee_growth_outside_upper_x128
+    elif tick_current < tick_upper:
+        inside = fee_growth_global_x128 - fee_growth_outside_lower_x128 - fee_growth_outside_upper_x128
+    else:
+        inside = fee_growth_outside_upper_x128 - fee_growth_outside_lower_x128
+    return inside % _UINT256_MOD
+
+
+# native engine classes for backtesting without the EVM
+class UniswapV3LPSimpleEngine:
+    """
+    Integer-exact, pure-Python port of UniswapV3LPSimpleBacktest.
+
+    Reads pool state from the ref state last passed to set_state, as the
+    backtester contract would from the mock pool after set_mocks_state.
+    """
+
+    def __init__(self):
+        self.tick_lower = 0
+        self.tick_upper = 0
+        self.liquidity = 0
+        self.fee_growth_inside0_x128 = 0  # fee growth inside at start of lp period
+        self.fee_growth_inside1_x128 = 0
+
+        self._state: Optional[Mapping] = None
+        self._tick = 0  # mock pool tick as set from sqrt price
+
+    def set_state(self, state: Mapping):
+        """
+        Sets the pool state to read from, mirroring set_mocks_state.
+
+        Args:
+            state (Mapping): The ref state with tick info for the current tick lower and upper.
+        """
+        self._state = state
+
+        # @dev MockUniswapV3Pool.setSqrtPriceX96 sets tick from sqrt price not from ref slot0.tick
+        self._tick = get_tick_at_sqrt_ratio(state["slot0"].sqrtPriceX96)
+
+    def _get_fee_growth_inside(self) -> (int, int):
+        """
+        Fee growth inside the position ticks for the current pool state.
+        """
+        state = self._state
+        return tuple(
+            get_fee_growth_inside(
+                self._tick,
+                self.tick_lower,
+                self.tick_upper,
+                state[f"fee_growth_global{i}_x128"],
+                getattr(state["tick_info_lower"], f"feeGrowthOutside{i}X128"),
+                getattr(state["tick_info_upper"], f"feeGrowthOutside{i}X128"),
+            )
+            for i in range(2)
+        )
+
+    def update(self, tick_lower: int, tick_upper: int, liquidity: int):
+        """
+        Updates position attributes and stores the current fee growth inside.
+        """
+        self.tick_lower = tick_lower
+        self.tick_upper = tick_upper
+        self.liquidity = liquidity
+        (self.fee_growth_inside0_x128, self.fee_growth_inside1_x128) = self._get_fee_growth_inside()
+
+    def principal(self, sqrt_ratio_x96: int) -> (int, int):
+        """
+        Port of LiquidityAmounts.getAmountsForLiquidity for the position.
+        """
+        sqrt_ratio_a_x96 = get_sqrt_ratio_at_tick(self.tick_lower)
+        sqrt_ratio_b_x96 = get_sqrt_ratio_at_tick(self.tick_upper)
+
+        if sqrt_ratio_x96 <= sqrt_ratio_a_x96:
+            return (get_amount0_for_liquidity(sqrt_ratio_a_x96, sqrt_ratio_b_x96, self.liquidity), 0)
+        elif sqrt_ratio_x96 < sqrt_ratio_b_x96:
+            return (
+                get_amount0_for_liquidity(sqrt_ratio_x96, sqrt_ratio_b_x96, self.liquidity),
+                get_amount1_for_liquidity(sqrt_ratio_a_x96, sqrt_ratio_x96, self.liquidity),
+            )
+        else:
+            return (0, get_amount1_for_liquidity(sqrt_ratio_a_x96, sqrt_ratio_b_x96, self.liquidity))
+
+    def fees(self) -> (int, int):
+        """
+        Fees accumulated by the position since the last update.
+
+        Raises EngineRevertError where MockPositionValue._fees would revert on the checked
+        subtraction of fee growth inside last from fee growth inside.
+        """
+        (inside0, inside1) = self._get_fee_growth_inside()
+        if inside0 < self.fee_growth_inside0_x128 or inside1 < self.fee_growth_inside1_x128:
+            raise EngineRevertError("fee growth inside less than fee growth inside last")
+
+        amount0 = ((inside0 - self.fee_growth_inside0_x128) * self.liquidity) >> 128
+        amount1 = ((inside1 - self.fee_growth_inside1_x128) * self.liquidity) >> 128
+        return (amount0, amount1)
+
+    def values(self) -> List[int]:
+        """
+        Reports principal and fees of the position for the current pool state.
+
+        Returns:
+            List[int]: [principal0, principal1, fees0, fees1]
+        """
+        (principal0, principal1) = self.principal(self._state["slot0"].sqrtPriceX96)
+        (fees0, fees1) = self.fees()
+        return [principal0, principal1, fees0, fees1]
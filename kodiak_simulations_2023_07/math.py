@@ -1,8 +1,10 @@
 import numpy as np
+import numpy.typing as npt
 
+from functools import lru_cache
 from scipy import pi
-from scipy.special import erf
-from scipy.stats import norm
+from scipy.special import comb, erf, ndtr
+from typing import List, Tuple
 
 
 def s(sigma: float, tau: float) -> float:
@@ -35,78 +37,391 @@ def dm(delta: float, mu: float, sigma: float, tau: float) -> float:
     return (-delta - _mp) / _s
 
 
-def rho(delta: float, mu: float, sigma: float, tau: float, ef: float, el: float) -> float:
+# sign of d(arg)/d(delta) * s for each stacked normal CDF argument in rho
+_SIGNS = np.array([1, -1, 1, -1, 1, -1, 1, -1, 1, -1, 0, 0])
+
+
+def _cdfs(
+    delta: npt.ArrayLike, mu: npt.ArrayLike, sigma: npt.ArrayLike, tau: npt.ArrayLike, order: int = 0
+) -> List[np.ndarray]:
     """
-    Expected value of principal for LP at end of rebalance period per unit of amount1.
+    Standard normal CDF evaluated once at each distinct argument appearing in rho,
+    along with its derivatives with respect to delta up to given order (<= 2).
+
+    Arguments are broadcast against each other and stacked along the leading axis
+    in the order: d_{+}, d_{-}, d_{+} - s, d_{-} - s, d_{+} - s/2, d_{-} - s/2,
+    d_{+} + s/2, d_{-} + s/2, d_{+} - 3s/2, d_{-} - 3s/2, -mp/s - s, -mp/s.
     """
     _dp = dp(delta, mu, sigma, tau)
     _dm = dm(delta, mu, sigma, tau)
     _mp = mp(mu, sigma, tau)
+    _s = s(sigma, tau)
+    args = np.broadcast_arrays(
+        _dp,
+        _dm,
+        _dp - _s,
+        _dm - _s,
+        _dp - _s / 2,
+        _dm - _s / 2,
+        _dp + _s / 2,
+        _dm + _s / 2,
+        _dp - 3 * _s / 2,
+        _dm - 3 * _s / 2,
+        -_mp / _s - _s,
+        -_mp / _s,
+    )
+    x = np.stack(args)
+    cdfs = [ndtr(x)]
+    if order == 0:
+        return cdfs
+
+    # @dev Phi'(x) = phi(x) and phi'(x) = -x * phi(x) with dx/d(delta) = sign / s
+    sign = _SIGNS.reshape((-1,) + (1,) * (x.ndim - 1))
+    pdf = np.exp(-(x**2) / 2) / np.sqrt(2 * pi)
+    cdfs.append(sign * pdf / _s)
+    if order > 1:
+        cdfs.append(-(sign**2) * x * pdf / _s**2)
+
+    return cdfs
+
+
+def _chain(h: Tuple, _e: np.ndarray, order: int) -> List:
+    """
+    Converts derivatives (h, h', h'') of a function of e = exp(delta/2) with respect to e
+    into derivatives with respect to delta up to given order.
+    """
+    hs = [h[0], h[1] * _e / 2, h[2] * _e**2 / 4 + h[1] * _e / 4]
+    return hs[: order + 1]
+
+
+def _leibniz(f: List, g: List, order: int) -> List:
+    """
+    Derivatives of the product f * g up to given order from those of f and g.
+    """
+    return [sum(comb(n, j) * f[j] * g[n - j] for j in range(n + 1)) for n in range(order + 1)]
+
+
+def _rho(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    ef: npt.ArrayLike,
+    el: npt.ArrayLike,
+    order: int = 0,
+) -> List[np.ndarray]:
+    """
+    rho and its derivatives with respect to delta up to given order (<= 2).
+    """
+    cdfs = _cdfs(delta, mu, sigma, tau, order)
     _m = m(mu, tau)
     _s = s(sigma, tau)
 
-    # Principal before rebalance
-    _rho_1a = (1 + np.exp(delta / 2)) * (np.exp(_m) * norm.cdf(_dm - _s) + 1 - norm.cdf(_dp))
-    _rho_1b = (2 * np.exp((_m - _s**2 / 4) / 2) / (1 - np.exp(-delta / 2))) * (
-        norm.cdf(_dp - _s / 2) - norm.cdf(_dm - _s / 2)
-    )
-    _rho_1c = -(1 / (np.exp(delta / 2) - 1)) * (
-        norm.cdf(_dp) - norm.cdf(_dm) + np.exp(_m) * (norm.cdf(_dp - _s) - norm.cdf(_dm - _s))
-    )
-    _rho_1 = _rho_1a + _rho_1b + _rho_1c
-
-    # Swap fees on rebalance
-    _rho_2a = -(ef / 2) * (1 + np.exp(delta / 2)) * (np.exp(_m) * norm.cdf(_dm - _s) + 1 - norm.cdf(_dp))
-    _rho_2b = (
-        -(ef / 2)
-        * (1 / (np.exp(delta / 2) - 1))
-        * (
-            np.exp(_m) * norm.cdf(_dp - _s)
-            + norm.cdf(_dm - _s)
-            - 2 * norm.cdf(-_mp / _s - _s)
-            + 2 * norm.cdf(-_mp / _s)
-            - norm.cdf(_dp)
-            - norm.cdf(_dm)
-        )
-    )
-    _rho_2 = _rho_2a + _rho_2b
-
-    # Slippage lost on rebalance
-    _rho_3a = (
-        -(el / 4)
-        * ((np.exp(delta / 2) + 1) ** 2)
-        * np.exp((_m + 3 * _s**2 / 4) / 2)
-        * (np.exp(-_m) * (1 - norm.cdf(_dp + _s / 2)) + np.exp(_m) * norm.cdf(_dm - 3 * _s / 2))
-    )
-    _rho_3b = (
-        -(el / 4)
-        * (np.exp((_m + 3 * _s**2 / 4) / 2) / (np.exp(delta / 2) - 1) ** 2)
-        * (
-            np.exp(_m) * (norm.cdf(_dp - 3 * _s / 2) - norm.cdf(_dm - 3 * _s / 2))
-            + np.exp(-_m) * (norm.cdf(_dp + _s / 2) - norm.cdf(_dm + _s / 2))
-        )
-    )
-    _rho_3c = (
-        (el / 2)
-        * (np.exp((_m - _s**2 / 4) / 2) / (np.exp(delta / 2) - 1) ** 2)
-        * (norm.cdf(_dp - _s / 2) - norm.cdf(_dm - _s / 2))
-    )
-    _rho_3 = _rho_3a + _rho_3b + _rho_3c
+    _e = np.exp(delta / 2)
+    _em = np.exp(_m)
+    _a = np.exp((_m - _s**2 / 4) / 2)
+    _k = np.exp((_m + 3 * _s**2 / 4) / 2)
+
+    # linear combinations of normal CDFs multiplying each delta-dependent prefactor
+    # @dev constant terms drop out of the derivatives
+    gs = {name: [] for name in ["out", "in_h", "in_1c", "in_2b", "in_3a", "in_3b"]}
+    for j, cdf in enumerate(cdfs):
+        (n_dp, n_dm, n_dp_s, n_dm_s, n_dp_hs, n_dm_hs, n_dp_phs, n_dm_phs, n_dp_3hs, n_dm_3hs, n_0_s, n_0) = cdf
+        one = 1 if j == 0 else 0
+        gs["out"].append(_em * n_dm_s + one - n_dp)
+        gs["in_h"].append(n_dp_hs - n_dm_hs)
+        gs["in_1c"].append(n_dp - n_dm + _em * (n_dp_s - n_dm_s))
+        gs["in_2b"].append(_em * n_dp_s + n_dm_s - 2 * n_0_s + 2 * n_0 - n_dp - n_dm)
+        gs["in_3a"].append((one - n_dp_phs) / _em + _em * n_dm_3hs)
+        gs["in_3b"].append(_em * (n_dp_3hs - n_dm_3hs) + (n_dp_phs - n_dm_phs) / _em)
 
-    return _rho_1 + _rho_2 + _rho_3
+    # delta-dependent prefactors as functions of e = exp(delta/2)
+    h_a = _chain((1 + _e, 1, 0), _e, order)  # 1 + e
+    h_b = _chain((_e / (_e - 1), -1 / (_e - 1) ** 2, 2 / (_e - 1) ** 3), _e, order)  # 1 / (1 - 1/e)
+    h_c = _chain((1 / (_e - 1), -1 / (_e - 1) ** 2, 2 / (_e - 1) ** 3), _e, order)  # 1 / (e - 1)
+    h_d = _chain(((_e + 1) ** 2, 2 * (_e + 1), 2), _e, order)  # (e + 1)**2
+    h_e = _chain((1 / (_e - 1) ** 2, -2 / (_e - 1) ** 3, 6 / (_e - 1) ** 4), _e, order)  # 1 / (e - 1)**2
 
+    terms = [
+        # Principal before rebalance
+        (1, h_a, gs["out"]),
+        (2 * _a, h_b, gs["in_h"]),
+        (-1, h_c, gs["in_1c"]),
+        # Swap fees on rebalance
+        (-(ef / 2), h_a, gs["out"]),
+        (-(ef / 2), h_c, gs["in_2b"]),
+        # Slippage lost on rebalance
+        (-(el / 4) * _k, h_d, gs["in_3a"]),
+        (-(el / 4) * _k, h_e, gs["in_3b"]),
+        ((el / 2) * _a, h_e, gs["in_h"]),
+    ]
+    rhos = [0] * (order + 1)
+    for coeff, h, g in terms:
+        for n, d in enumerate(_leibniz(h, g, order)):
+            rhos[n] = rhos[n] + coeff * d
 
-def psi(delta: float, mu: float, sigma: float, tau: float, theta: float, el: float) -> float:
+    return rhos
+
+
+def rho(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    ef: npt.ArrayLike,
+    el: npt.ArrayLike,
+) -> np.ndarray:
     """
-    Expected value of accumulated fees for LP at end of rebalance period per unit of amount1.
+    Expected value of principal for LP at end of rebalance period per unit of amount1.
+
+    Broadcasts over array inputs.
+    """
+    return _rho(delta, mu, sigma, tau, ef, el)[0]
+
+
+def drho(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    ef: npt.ArrayLike,
+    el: npt.ArrayLike,
+) -> np.ndarray:
+    """
+    First derivative of rho with respect to delta.
+    """
+    return _rho(delta, mu, sigma, tau, ef, el, order=1)[1]
+
+
+def d2rho(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    ef: npt.ArrayLike,
+    el: npt.ArrayLike,
+) -> np.ndarray:
+    """
+    Second derivative of rho with respect to delta.
+    """
+    return _rho(delta, mu, sigma, tau, ef, el, order=2)[2]
+
+
+@lru_cache(maxsize=None)
+def _legendre(quad_order: int) -> (np.ndarray, np.ndarray):
+    """
+    Gauss-Legendre nodes and weights of given order mapped to [0, 1].
+    """
+    (x, w) = np.polynomial.legendre.leggauss(quad_order)
+    (x, w) = ((x + 1) / 2, w / 2)
+    x.flags.writeable = False
+    w.flags.writeable = False
+    return (x, w)
+
+
+def _occupation(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    quad_order: int,
+    order: int = 0,
+) -> List[np.ndarray]:
+    """
+    Expected time over the rebalance period the log-price spends in [-delta, delta],
+    weighted by (1 + P(tau) / P(0)), and its derivatives with respect to delta up to given order (<= 2).
+
+    Integrates E[(1 + P(tau)/P(0)) * 1{|log(P(t)/P(0))| < delta}]
+      = N(d+(t)) - N(d-(t)) + exp(m) * (N(d+(t) - s(t)) - N(d-(t) - s(t)))
+    over t in [0, tau] with Gauss-Legendre quadrature in u = sqrt(t / tau), split
+    into panels [0, a] and [a, 1] (log-spaced) at a = min(delta / s, 1) where the
+    integrand turns over.
+    """
+    (x, w) = _legendre(quad_order)
+    (delta, mu, sigma, tau) = [np.asarray(p, dtype=float)[..., None] for p in (delta, mu, sigma, tau)]
+    _s = s(sigma, tau)
+    _a = np.minimum(delta / _s, 1)
+
+    # nodes and weights for both panels along last axis
+    _u = np.concatenate(np.broadcast_arrays(_a * x, _a ** (1 - x)), axis=-1)
+    _w = np.concatenate(np.broadcast_arrays(_a * w, -np.log(_a) * w * _a ** (1 - x)), axis=-1)
+    _w = 2 * tau * _u * _w  # dt = 2 * tau * u * du
+
+    _t = tau * _u**2
+    _st = _s * _u
+    _mpt = (mu - sigma**2 / 2) * _t
+    _em = np.exp(m(mu, tau))
+
+    # upper and lower args for 1 then for P(tau)/P(0) terms
+    _dp = (delta - _mpt) / _st
+    _dm = (-delta - _mpt) / _st
+    args = np.stack(np.broadcast_arrays(_dp, _dm, _dp - _st, _dm - _st))
+    _signs = np.array([1, -1, 1, -1]).reshape((4,) + (1,) * (args.ndim - 1))
+
+    integrands = [_signs * ndtr(args)]
+    if order > 0:
+        # @dev d(arg)/d(delta) = sign / st, so derivatives of N(arg) are sign * pdf / st, -arg * pdf / st**2
+        _pdf = np.exp(-(args**2) / 2) / np.sqrt(2 * pi)
+        integrands += [_pdf / _st, -_signs * args * _pdf / _st**2][:order]
+
+    return [np.sum((f[0] + f[1] + _em * (f[2] + f[3])) * _w, axis=-1) for f in integrands]
+
+
+def _psi(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    theta: npt.ArrayLike,
+    el: npt.ArrayLike,
+    order: int = 0,
+    quad_order: int = 0,
+) -> List[np.ndarray]:
+    """
+    psi and its derivatives with respect to delta up to given order (<= 2).
+
+    Closed-form approx if quad_order = 0, otherwise exact up to quadrature error
+    with 2 * quad_order nodes.
     """
-    # TODO: Fix so not rough approx as below (ignores O(_s**2))
+    _factor = theta / (1 - np.exp(-delta / 2) + el)
+    if quad_order > 0:
+        integs = _occupation(delta, mu, sigma, tau, quad_order, order)
+    else:
+        integs = _psi_approx_integs(delta, mu, sigma, tau, order)
+
+    if order == 0:
+        return [_factor * integs[0]]
+
+    # @dev factor = theta / q with q = 1 - exp(-delta/2) + el
+    _q = 1 - np.exp(-delta / 2) + el
+    _q1 = np.exp(-delta / 2) / 2
+    _q2 = -np.exp(-delta / 2) / 4
+    factors = [_factor, -theta * _q1 / _q**2, theta * (2 * _q1**2 / _q**3 - _q2 / _q**2)]
+
+    return _leibniz(factors, integs, order)
+
+
+def _psi_approx_integs(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    order: int = 0,
+) -> List[np.ndarray]:
+    """
+    Drift-free closed-form approx to the weighted occupation time in _occupation
+    and its derivatives with respect to delta up to given order (<= 2).
+    """
+    # TODO: Fix so not rough approx as below (ignores O(_s**2)). Use quad_order > 0 for exact
     _m = m(mu, tau)
     _dap = delta / (sigma * np.sqrt(tau))
-    _factor = theta / (1 - np.exp(-delta / 2) + el)
     _integ = (
         ((delta / sigma) ** 2 + tau) * erf(_dap / np.sqrt(2))
         + np.sqrt(2 / pi) * (delta / sigma) * np.sqrt(tau) * np.exp(-((_dap) ** 2) / 2)
         - (delta / sigma) ** 2
     )
-    return _factor * _integ * (1 + np.exp(_m))
+    _c = 1 + np.exp(_m)
+    if order == 0:
+        return [_integ * _c]
+
+    # @dev integ = tau * J(a) with a = delta / s, so that
+    #   J'(a) = 2 * a * (erf(a/sqrt(2)) - 1) + 4 * phi(a) and J''(a) = 2 * (erf(a/sqrt(2)) - 1)
+    _s = s(sigma, tau)
+    _erfc = erf(_dap / np.sqrt(2)) - 1
+    _pdf = np.exp(-(_dap**2) / 2) / np.sqrt(2 * pi)
+    integs = [_integ, tau * (2 * _dap * _erfc + 4 * _pdf) / _s, tau * 2 * _erfc / _s**2]
+    return [_c * d for d in integs[: order + 1]]
+
+
+def psi(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    theta: npt.ArrayLike,
+    el: npt.ArrayLike,
+    quad_order: int = 0,
+) -> np.ndarray:
+    """
+    Expected value of accumulated fees for LP at end of rebalance period per unit of amount1.
+
+    Uses the drift-free closed-form approx if quad_order = 0, otherwise integrates the
+    expected occupation time in range exactly with Gauss-Legendre quadrature of given order.
+
+    Broadcasts over array inputs.
+    """
+    return _psi(delta, mu, sigma, tau, theta, el, quad_order=quad_order)[0]
+
+
+def dpsi(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    theta: npt.ArrayLike,
+    el: npt.ArrayLike,
+    quad_order: int = 0,
+) -> np.ndarray:
+    """
+    First derivative of psi with respect to delta.
+    """
+    return _psi(delta, mu, sigma, tau, theta, el, order=1, quad_order=quad_order)[1]
+
+
+def d2psi(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    theta: npt.ArrayLike,
+    el: npt.ArrayLike,
+    quad_order: int = 0,
+) -> np.ndarray:
+    """
+    Second derivative of psi with respect to delta.
+    """
+    return _psi(delta, mu, sigma, tau, theta, el, order=2, quad_order=quad_order)[2]
+
+
+def ev_derivs(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    ef: npt.ArrayLike,
+    el: npt.ArrayLike,
+    theta: npt.ArrayLike,
+    order: int = 2,
+    quad_order: int = 0,
+) -> List[np.ndarray]:
+    """
+    EV (rho + psi) and its closed-form derivatives with respect to delta up to given order (<= 2),
+    sharing the normal CDF and prefactor evaluations across orders.
+
+    Returns:
+        List[np.ndarray]: [ev, d(ev)/d(delta), d^2(ev)/d(delta)^2][: order + 1]
+    """
+    rhos = _rho(delta, mu, sigma, tau, ef, el, order)
+    psis = _psi(delta, mu, sigma, tau, theta, el, order, quad_order)
+    return [r + p for r, p in zip(rhos, psis)]
+
+
+def ev(
+    delta: npt.ArrayLike,
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    ef: npt.ArrayLike,
+    el: npt.ArrayLike,
+    theta: npt.ArrayLike,
+    quad_order: int = 0,
+) -> np.ndarray:
+    """
+    Expected value of LP position (principal + fees) at end of rebalance period
+    per unit of amount1, i.e. rho + psi. Normalized to 2 when tau = 0.
+
+    Broadcasts all inputs against each other, so e.g. a grid of deltas against
+    a column of taus returns the full EV grid in one vectorized pass. See psi
+    for quad_order.
+    """
+    return rho(delta, mu, sigma, tau, ef, el) + psi(delta, mu, sigma, tau, theta, el, quad_order)
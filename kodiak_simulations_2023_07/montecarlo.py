@@ -0,0 +1,167 @@
+import click
+import numpy as np
+import numpy.typing as npt
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Tuple
+
+
+# components of LP value at end of rebalance period per unit of amount1, normalized to 2 when tau = 0
+COMPONENTS = ["principal", "swap_fees", "slippage", "rho", "psi", "ev"]
+
+
+def _path_values(
+    x: np.ndarray,
+    occupation: np.ndarray,
+    delta: np.ndarray,
+    ef: float,
+    el: float,
+    theta: float,
+) -> Dict[str, np.ndarray]:
+    """
+    Pathwise components of LP value given end log-prices x with shape (n, 1)
+    and time spent in range for each delta with shape (n, len(delta)).
+    """
+    _e = np.exp(delta / 2)
+    _ex = np.exp(x)
+    above = x >= delta
+    below = x <= -delta
+
+    # principal before rebalance
+    principal = np.where(
+        above,
+        _e + 1,
+        np.where(below, _ex * (_e + 1), (2 * np.exp(x / 2) - (1 + _ex) / _e) / (1 - 1 / _e)),
+    )
+
+    # amount swapped on rebalance back to 50/50
+    swapped = np.where(above, _e + 1, np.where(below, _ex * (_e + 1), np.abs(1 - _ex) / (_e - 1)))
+    swap_fees = -(ef / 2) * swapped
+    slippage = -(el / 4) * np.exp(-x / 2) * swapped**2
+
+    rho = principal + swap_fees + slippage
+    psi = theta / (1 - 1 / _e + el) * (1 + _ex) * occupation
+    return {
+        "principal": principal,
+        "swap_fees": swap_fees,
+        "slippage": slippage,
+        "rho": rho,
+        "psi": psi,
+        "ev": rho + psi,
+    }
+
+
+def _simulate_chunk(
+    seed: np.random.SeedSequence,
+    n_paths: int,
+    delta: np.ndarray,
+    dist: Any,
+    n_steps: int,
+    dt: float,
+    ef: float,
+    el: float,
+    theta: float,
+    block_size: int,
+) -> Dict[str, Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    Simulates a chunk of log-price paths, streaming increments over time in blocks
+    of at most block_size steps to bound memory.
+
+    Returns:
+        Dict[str, Tuple[int, np.ndarray, np.ndarray]]: Count, mean and sum of squared deviations
+            of each component over the chunk
+    """
+    rng = np.random.default_rng(seed)
+    x = np.zeros((n_paths, 1))
+    inside = np.ones((n_paths, len(delta)), dtype=bool)
+    occupation = np.zeros((n_paths, len(delta)))
+
+    # @dev trapezoid rule for time in range with log-price sampled each step
+    for start in range(0, n_steps, block_size):
+        size = min(block_size, n_steps - start)
+        xs = x + np.cumsum(dist.rvs(size=(n_paths, size), random_state=rng), axis=1)
+        insides = np.abs(xs[:, :, None]) < delta
+        occupation += (np.sum(insides, axis=1) + (inside.astype(float) - insides[:, -1]) / 2) * dt
+        inside = insides[:, -1]
+        x = xs[:, -1:]
+
+    values = _path_values(x, occupation, delta, ef, el, theta)
+    return {
+        name: (n_paths, np.mean(v, axis=0), np.sum((v - np.mean(v, axis=0)) ** 2, axis=0)) for name, v in values.items()
+    }
+
+
+def _merge(a: Tuple[int, np.ndarray, np.ndarray], b: Tuple[int, np.ndarray, np.ndarray]) -> Tuple:
+    """
+    Merges streaming (count, mean, sum of squared deviations) estimates of two samples.
+    """
+    (n_a, mean_a, m2_a) = a
+    (n_b, mean_b, m2_b) = b
+    n = n_a + n_b
+    diff = mean_b - mean_a
+    return (n, mean_a + diff * n_b / n, m2_a + m2_b + diff**2 * n_a * n_b / n)
+
+
+def simulate_ev(
+    delta: npt.ArrayLike,
+    dist: Any,
+    n_steps: int,
+    ef: float,
+    el: float,
+    theta: float,
+    dt: float = 1,
+    n_paths: int = 100000,
+    chunk_size: int = 10000,
+    block_size: int = 256,
+    seed: int = 0,
+    max_workers: int = 0,
+) -> (Dict[str, np.ndarray], Dict[str, np.ndarray]):
+    """
+    Monte Carlo estimate of LP value (principal + fees) at end of rebalance period
+    per unit of amount1, normalized to 2 when tau = 0, for log-price increments
+    drawn i.i.d. from any frozen scipy.stats distribution. Counterpart to
+    math.rho and math.psi that does not assume GBM.
+
+    Paths are simulated in chunks of chunk_size, each seeded from a child of
+    SeedSequence(seed) so results are reproducible regardless of max_workers.
+    All deltas share the same paths.
+
+    Args:
+        delta (npt.ArrayLike): Deltas to LP with
+        dist (Any): Frozen scipy.stats distribution of log-price increments per step, e.g. norm(loc, scale)
+        n_steps (int): Number of steps in the rebalance period
+        theta (float): Fee volume per unit of external liquidity per unit time
+        dt (float): Time per step, e.g. blocks per candle so tau = n_steps * dt
+        block_size (int): Max number of steps to draw at once per chunk
+        max_workers (int): Number of processes to fan chunks out to. 0 runs serially.
+
+    Returns:
+        means (Dict[str, np.ndarray]): Estimates of each of COMPONENTS with shape of delta
+        stderrs (Dict[str, np.ndarray]): Standard errors of the estimates
+    """
+    delta = np.asarray(delta, dtype=float)
+    shape = delta.shape
+    _delta = np.ravel(delta)
+
+    sizes = [min(chunk_size, n_paths - i) for i in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(sd, size, _delta, dist, n_steps, dt, ef, el, theta, block_size) for sd, size in zip(seeds, sizes)]
+
+    click.echo(f"Simulating {n_paths} paths of {n_steps} steps in {len(sizes)} chunks ...")
+    if max_workers > 0:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_simulate_chunk, *zip(*args)))
+    else:
+        results = [_simulate_chunk(*a) for a in args]
+
+    means = {}
+    stderrs = {}
+    for name in COMPONENTS:
+        (n, mean, m2) = results[0][name]
+        for result in results[1:]:
+            (n, mean, m2) = _merge((n, mean, m2), result[name])
+
+        means[name] = mean.reshape(shape)
+        stderrs[name] = np.sqrt(m2 / (n - 1) / n).reshape(shape)
+
+    return (means, stderrs)
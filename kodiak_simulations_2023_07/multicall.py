@@ -0,0 +1,48 @@
+from typing import Any, List, Optional, Tuple
+
+from ape import chain
+from ape.contracts import ContractInstance
+from ape_ethereum import multicall
+from ape_ethereum.multicall.constants import MULTICALL3_ADDRESS
+
+
+def has_multicall(number: Optional[int] = None) -> bool:
+    """
+    Whether Multicall3 is deployed at block number.
+
+    Args:
+        number (Optional[int]): The block number. If None, then last block
+            from current provider chain.
+    """
+    return len(chain.provider.get_code(MULTICALL3_ADDRESS, block_id=number)) > 0
+
+
+def inject_multicall():
+    """
+    Deploys Multicall3 locally on the fork node if not already deployed at head.
+
+    WARNING: Only affects calls against local fork state, not historical blocks
+    prior to the fork block.
+    """
+    if not has_multicall():
+        multicall.BaseMulticall.inject()
+
+
+def aggregate(calls: List[Tuple[ContractInstance, str, Tuple]], number: Optional[int] = None) -> List[Any]:
+    """
+    Aggregates view method calls into a single Multicall3 aggregate3 call at block number.
+
+    Args:
+        calls (List[Tuple[ContractInstance, str, Tuple]]): The (contract, method, args) of each call.
+        number (Optional[int]): The block number. If None, then last block
+            from current provider chain.
+
+    Returns:
+        List[Any]: The decoded results of each call, in order.
+    """
+    call = multicall.Call()
+    for contract, method, args in calls:
+        call.add(getattr(contract, method), *args, allowFailure=False)
+
+    kwargs = {} if number is None else {"block_identifier": number}
+    return list(call(**kwargs))
@@ -1,9 +1,136 @@
 import click
 import numpy as np
+import numpy.typing as npt
 
 from scipy import optimize
 from .constants import MAX_TICK
-from .math import rho, psi, s
+from .math import ev, ev_derivs, s
+
+
+def _delta_bounds(tick_spacing: npt.ArrayLike) -> (np.ndarray, np.ndarray):
+    """
+    Min and max (full range) delta to LP with given pool tick spacing.
+    """
+    delta_min = np.log(1.0001 ** (tick_spacing // 2))
+    delta_max = np.log(1.0001 ** (MAX_TICK - (MAX_TICK % tick_spacing)))  # full tick width given pool tick spacing
+    return (delta_min, delta_max)
+
+
+def find_optimal_deltas(
+    mu: npt.ArrayLike,
+    sigma: npt.ArrayLike,
+    tau: npt.ArrayLike,
+    ef: npt.ArrayLike,
+    el: npt.ArrayLike,
+    theta: npt.ArrayLike,
+    tick_spacing: npt.ArrayLike,
+    x0: npt.ArrayLike = None,
+    xtol: float = 1e-8,
+    maxiter: int = 50,
+    full_output: bool = False,
+    quad_order: int = 0,
+) -> tuple:
+    """
+    Finds optimal deltas to LP with for a batch of parameter sets at once.
+
+    Inputs are broadcast against each other and all problems are solved together.
+    Starting from the initial guesses, each problem first brackets a root of
+    d(ev)/d(delta) by stepping geometrically up or down hill, then runs a safeguarded
+    Newton iteration from the initial guess within the bracket using closed-form first and second derivatives
+    over the batched EV kernel, falling back to bisection in log(delta) whenever the
+    Newton step leaves the bracket or EV is not locally concave. Problems drop out of
+    the batch as they converge. Deltas are bounded between a single pool tick spacing
+    and full range, and the bound is returned instead when it has greater EV.
+
+    Args:
+        x0 (npt.ArrayLike): Initial guesses for delta. Defaults to sigma * sqrt(tau).
+        xtol (float): Relative tolerance in delta for convergence.
+        maxiter (int): Max number of bracketing steps and of Newton iterations.
+        full_output (bool): Whether to also return the number of iterations taken.
+        quad_order (int): Quadrature order for exact psi. 0 for the closed-form approx.
+
+    Returns:
+        deltas (np.ndarray): The optimal deltas to LP with
+        values (np.ndarray): EVs under GBM at the optimal deltas, normalized to 1 when tau = 0
+        converged (np.ndarray): Whether each problem converged within xtol
+        nits (np.ndarray): Number of bracketing steps plus Newton iterations taken for each problem, if full_output
+    """
+    (mu, sigma, tau, ef, el, theta, tick_spacing) = np.broadcast_arrays(mu, sigma, tau, ef, el, theta, tick_spacing)
+    shape = mu.shape
+    params = [np.ravel(p).astype(float) for p in (mu, sigma, tau, ef, el, theta)]
+
+    # @dev EV undefined at delta = 0 so bound below by a single tick
+    (delta_min, delta_max) = _delta_bounds(np.ravel(tick_spacing))
+    delta_min = np.maximum(delta_min, np.log(1.0001))
+    delta_max = delta_max.astype(float)
+
+    # use sigma * sqrt(tau) as initial guess
+    x = s(params[1], params[2]) if x0 is None else np.ravel(np.broadcast_to(x0, shape)).astype(float)
+    x = np.clip(x, delta_min, delta_max)
+
+    # bracket roots of gradient: lo, hi with g(lo) > 0 > g(hi) once found
+    start = x
+    (_, g) = ev_derivs(x, *params, order=1, quad_order=quad_order)
+    up = g > 0
+    lo = np.where(up, x, delta_min)
+    hi = np.where(up, delta_max, x)
+    nits = np.zeros(x.shape, dtype=int)
+
+    # @dev rows with gradient vanishing at a bound of the domain have no interior root
+    bracketed = np.zeros(x.shape, dtype=bool)
+    idx = np.flatnonzero((up & (x < delta_max)) | (~up & (x > delta_min)))
+    probe = x[idx]
+    for nit in range(1, maxiter + 1):
+        if idx.size == 0:
+            break
+
+        probe = np.where(up[idx], np.minimum(4 * probe, delta_max[idx]), np.maximum(probe / 4, delta_min[idx]))
+        (_, g) = ev_derivs(probe, *[p[idx] for p in params], order=1, quad_order=quad_order)
+        lo[idx] = np.where(g > 0, probe, lo[idx])
+        hi[idx] = np.where(g > 0, hi[idx], probe)
+        nits[idx] = nit
+
+        found = np.where(up[idx], g <= 0, g > 0)
+        bracketed[idx] = found
+        keep = ~found & (probe > delta_min[idx]) & (probe < delta_max[idx])
+        (idx, probe) = (idx[keep], probe[keep])
+
+    # newton within brackets starting from initial guesses
+    deltas = np.where(bracketed, start, np.where(up, delta_max, delta_min))
+    converged = ~bracketed
+    idx = np.flatnonzero(bracketed)
+    (x, lo, hi) = (deltas[idx], lo[idx], hi[idx])
+    for nit in range(1, maxiter + 1):
+        if idx.size == 0:
+            break
+
+        (_, g, h) = ev_derivs(x, *[p[idx] for p in params], order=2, quad_order=quad_order)
+
+        # shrink brackets around roots of gradient
+        lo = np.where(g > 0, x, lo)
+        hi = np.where(g > 0, hi, x)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_next = np.where(h < 0, x - g / h, np.nan)
+        x_next = np.where((lo < x_next) & (x_next < hi), x_next, np.sqrt(lo * hi))
+
+        done = np.abs(x_next - x) <= xtol * x
+        deltas[idx] = x_next
+        converged[idx] = done
+        nits[idx] += 1
+
+        keep = ~done
+        (idx, x, lo, hi) = (idx[keep], x_next[keep], lo[keep], hi[keep])
+
+    # compare against bounds of the domain
+    candidates = np.stack([deltas, delta_min, delta_max])
+    values = ev_derivs(candidates, *params, order=0, quad_order=quad_order)[0] / 2
+    best = np.argmax(values, axis=0)
+    deltas = np.take_along_axis(candidates, best[None], axis=0)[0]
+    values = np.take_along_axis(values, best[None], axis=0)[0]
+
+    result = (deltas.reshape(shape), values.reshape(shape), converged.reshape(shape))
+    return result + (nits.reshape(shape),) if full_output else result
 
 
 def find_optimal_delta(
@@ -14,30 +141,122 @@ def find_optimal_delta(
     el: float,
     theta: float,
     tick_spacing: float,
+    method: str = "newton",
+    quad_order: int = 0,
 ) -> (float, float):
     """
     Finds optimal delta to LP with using EV function to optimized
     with respect to delta.
 
+    Args:
+        method (str): "newton" for safeguarded Newton iteration on the closed-form
+            EV derivatives, otherwise the scipy.optimize.minimize method to use
+            with the closed-form gradient (e.g. "L-BFGS-B").
+        quad_order (int): Quadrature order for exact psi. 0 for the closed-form approx.
+
     Returns:
         delta (float): The optimal delta to LP with
         value (float): EV under GBM at the optimal delta, normalized to 1 when tau = 0
     """
+    if method == "newton":
+        (delta, value, converged, nit) = find_optimal_deltas(
+            mu, sigma, tau, ef, el, theta, tick_spacing, full_output=True, quad_order=quad_order
+        )
+
+        click.echo("Result from Newton iteration ...")
+        click.echo(f"delta: {delta}, nit: {nit}, converged: {converged}")
+
+        return (float(delta), float(value))
 
     # @dev Return negative as looking for maximum via scipy.optimize.minimize
-    def ev(delta: float) -> float:
-        return -(rho(delta, mu, sigma, tau, ef, el) + psi(delta, mu, sigma, tau, theta, el))
+    def fun(x: np.ndarray) -> (float, np.ndarray):
+        (v, g) = ev_derivs(x[0], mu, sigma, tau, ef, el, theta, order=1, quad_order=quad_order)
+        return (-v, np.array([-g]))
 
-    delta_min = np.log(1.0001 ** (tick_spacing // 2))
-    delta_max = np.log(1.0001 ** (MAX_TICK - (MAX_TICK % tick_spacing)))  # full tick width given pool tick spacing
+    (delta_min, delta_max) = _delta_bounds(tick_spacing)
 
     # use sigma * sqrt(tau) as initial guess
     x0 = s(sigma, tau)
-    res = optimize.minimize(ev, x0, bounds=[(delta_min, None)])
+    res = optimize.minimize(fun, x0, jac=True, method=method, bounds=[(delta_min, None)])
 
     click.echo("Result from scipy.optimize.minimize ...")
     click.echo(f"{res}")
 
     delta = res.x[0] if res.success else delta_max
-    value = -ev(delta) / 2
+    value = -fun(np.array([delta]))[0] / 2
     return (delta, value)
+
+
+def ev_rates(
+    taus: npt.ArrayLike,
+    deltas: npt.ArrayLike,
+    mu: float,
+    sigma: float,
+    ef: float,
+    el: float,
+    theta: float,
+    quad_order: int = 0,
+) -> np.ndarray:
+    """
+    EV yield per unit time (E[V(tau)/V(0)] - 1) / tau over the grid of
+    rebalance periods and deltas, in a single vectorized evaluation.
+
+    Returns:
+        rates (np.ndarray): EV yields per unit time with shape (len(taus), len(deltas))
+    """
+    taus = np.asarray(taus, dtype=float)[:, None]
+    values = ev(np.asarray(deltas, dtype=float)[None, :], mu, sigma, taus, ef, el, theta, quad_order) / 2
+    return (values - 1) / taus
+
+
+def find_optimal_tau_delta(
+    mu: float,
+    sigma: float,
+    ef: float,
+    el: float,
+    theta: float,
+    tick_spacing: float,
+    taus: npt.ArrayLike,
+    deltas: npt.ArrayLike = None,
+    quad_order: int = 0,
+) -> (float, float, float, np.ndarray):
+    """
+    Finds optimal rebalance period and delta to LP with jointly by maximizing
+    EV yield per unit time.
+
+    Evaluates the (tau, delta) grid in one pass with ev_rates, then refines
+    the optimal delta for every tau at once with find_optimal_deltas warm started
+    from the best delta on the grid. The optimal tau is the best of the given taus.
+
+    Args:
+        taus (npt.ArrayLike): Rebalance periods to consider
+        deltas (npt.ArrayLike): Deltas for the grid. Defaults to 256 log-spaced
+            points between a single pool tick spacing and full range.
+        quad_order (int): Quadrature order for exact psi. 0 for the closed-form approx.
+
+    Returns:
+        tau (float): The optimal rebalance period
+        delta (float): The optimal delta to LP with for the optimal rebalance period
+        rate (float): EV yield per unit time at the optimum
+        rates (np.ndarray): EV yields per unit time over the (tau, delta) grid
+    """
+    (delta_min, delta_max) = _delta_bounds(tick_spacing)
+    if deltas is None:
+        deltas = np.geomspace(max(delta_min, np.log(1.0001)), delta_max, 256)
+
+    taus = np.asarray(taus, dtype=float)
+    deltas = np.asarray(deltas, dtype=float)
+    rates = ev_rates(taus, deltas, mu, sigma, ef, el, theta, quad_order)
+
+    # refine optimal delta per tau
+    x0 = deltas[np.argmax(rates, axis=1)]
+    (opt_deltas, opt_values, converged) = find_optimal_deltas(
+        mu, sigma, taus, ef, el, theta, tick_spacing, x0=x0, quad_order=quad_order
+    )
+    opt_rates = (opt_values - 1) / taus
+
+    i = np.argmax(opt_rates)
+    click.echo("Result from joint (tau, delta) optimization ...")
+    click.echo(f"tau: {taus[i]}, delta: {opt_deltas[i]}, rate: {opt_rates[i]}, converged: {converged[i]}")
+
+    return (float(taus[i]), float(opt_deltas[i]), float(opt_rates[i]), rates)
@@ -0,0 +1,124 @@
+from typing import Any, Dict, Mapping
+
+from ape import chain
+from ape.contracts import ContractInstance
+from eth_utils import keccak
+
+from .utils import get_tick_at_sqrt_ratio
+
+
+# storage slots of UniswapV3Pool state vars set on MockUniswapV3Pool
+SLOT0_SLOT = 0
+FEE_GROWTH_GLOBAL0_X128_SLOT = 1
+FEE_GROWTH_GLOBAL1_X128_SLOT = 2
+LIQUIDITY_SLOT = 4
+TICKS_SLOT = 5
+
+_UINT256_MOD = 1 << 256
+_UINT128_MOD = 1 << 128
+_UINT24_MOD = 1 << 24
+
+
+def _word(value: int) -> str:
+    """
+    Hex encodes value as a 32 byte storage word, two's complement if negative.
+    """
+    return "0x" + (value % _UINT256_MOD).to_bytes(32, "big").hex()
+
+
+def get_tick_slot(tick: int) -> int:
+    """
+    Storage slot of the Tick.Info struct for tick in the UniswapV3Pool ticks mapping.
+
+    Args:
+        tick (int): The tick.
+
+    Returns:
+        int: The slot of the first struct member, liquidityGross.
+    """
+    key = (tick % _UINT256_MOD).to_bytes(32, "big") + TICKS_SLOT.to_bytes(32, "big")
+    return int.from_bytes(keccak(key), "big")
+
+
+def get_slot0_word(sqrt_price_x96: int, slot0_word: int) -> int:
+    """
+    Packed slot0 word with sqrtPriceX96 and tick set as MockUniswapV3Pool.setSqrtPriceX96 would,
+    keeping the remaining slot0 members (observation index, cardinality, fee protocol, unlocked).
+
+    Args:
+        sqrt_price_x96 (int): The sqrt price to set.
+        slot0_word (int): The current slot0 word of the mock pool.
+
+    Returns:
+        int: The slot0 word.
+    """
+    tick = get_tick_at_sqrt_ratio(sqrt_price_x96)
+    rest = slot0_word >> 184
+    return sqrt_price_x96 | ((tick % _UINT24_MOD) << 160) | (rest << 184)
+
+
+def get_mock_pool_storage(state: Mapping, tick_lower: int, tick_upper: int, slot0_word: int) -> Dict[int, int]:
+    """
+    Storage writes equivalent to setting the mock pool to ref state through its setters.
+
+    Args:
+        state (Mapping): The ref state with tick info for tick lower and upper.
+        tick_lower (int): The position lower tick.
+        tick_upper (int): The position upper tick.
+        slot0_word (int): The current slot0 word of the mock pool.
+
+    Returns:
+        Dict[int, int]: The storage words keyed by slot.
+    """
+    storage = {
+        SLOT0_SLOT: get_slot0_word(state["slot0"].sqrtPriceX96, slot0_word),
+        FEE_GROWTH_GLOBAL0_X128_SLOT: state["fee_growth_global0_x128"],
+        FEE_GROWTH_GLOBAL1_X128_SLOT: state["fee_growth_global1_x128"],
+        LIQUIDITY_SLOT: state["liquidity"],
+    }
+
+    # @dev liquidityGross, liquidityNet packed in first slot of Tick.Info with fee growth outside in next two
+    for tick, info in [(tick_lower, state["tick_info_lower"]), (tick_upper, state["tick_info_upper"])]:
+        slot = get_tick_slot(tick)
+        storage[slot] = info.liquidityGross | ((info.liquidityNet % _UINT128_MOD) << 128)
+        storage[slot + 1] = info.feeGrowthOutside0X128
+        storage[slot + 2] = info.feeGrowthOutside1X128
+
+    return storage
+
+
+def get_storage_word(address: str, slot: int) -> int:
+    """
+    Gets the storage word at slot of address on the current provider chain.
+    """
+    return int.from_bytes(bytes(chain.provider.web3.eth.get_storage_at(address, slot)), "big")
+
+
+def call_with_storage(
+    contract: ContractInstance,
+    method: str,
+    *args: Any,
+    storage: Mapping[str, Mapping[int, int]],
+) -> Any:
+    """
+    Calls view method on contract as a single eth_call with storage of other
+    contracts overridden, without sending any transactions.
+
+    Args:
+        contract (:class:`ape.contracts.ContractInstance`): The contract to call.
+        method (str): The view method name.
+        storage (Mapping[str, Mapping[int, int]]): Storage words keyed by slot, keyed by contract address.
+
+    Returns:
+        Any: The decoded call result.
+    """
+    handler = getattr(contract, method)
+    txn = {"to": contract.address, "data": handler.encode_input(*args).hex()}
+    state_override = {
+        address: {"stateDiff": {_word(slot): _word(value) for slot, value in words.items()}}
+        for address, words in storage.items()
+    }
+    raw_output = chain.provider.web3.eth.call(txn, "latest", state_override)
+
+    output = chain.provider.network.ecosystem.decode_returndata(handler.abis[0], raw_output)
+    return output[0] if isinstance(output, (list, tuple)) and len(output) == 1 else output
@@ -0,0 +1,226 @@
+import click
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from typing import Dict
+
+from .constants import MAX_TICK
+
+
+# columns of a backtest records or pool state series needed for replay
+SERIES_COLUMNS = ["number", "sqrtPriceX96", "tick", "liquidity", "feeGrowthGlobal0X128", "feeGrowthGlobal1X128"]
+
+# outputs of replay for each (tick_width, tau) at each row of the series
+OUTPUTS = [
+    "tick_lower",
+    "tick_upper",
+    "liquidity",
+    "principal0",
+    "principal1",
+    "fees0",
+    "fees1",
+    "fees0_cumulative",
+    "fees1_cumulative",
+    "value",
+]
+
+
+def _fee_growth_deltas(fee_growth_global_x128: pd.Series) -> np.ndarray:
+    """
+    Fee growth global per unit of liquidity between consecutive rows, unwrapping uint256 overflow.
+    """
+    values = [int(v) for v in fee_growth_global_x128]
+    deltas = [0] + [((b - a) % (1 << 256)) / (1 << 128) for a, b in zip(values[:-1], values[1:])]
+    return np.array(deltas, dtype=float)
+
+
+def _sqrt_ratios(ticks: np.ndarray) -> np.ndarray:
+    """
+    Float sqrt price at ticks.
+    """
+    return np.power(1.0001, ticks / 2)
+
+
+def _amounts(sqrt_price: float, a: np.ndarray, b: np.ndarray, liquidity: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Float LiquidityAmounts.getAmountsForLiquidity, including prices outside of [a, b].
+    """
+    p = np.clip(sqrt_price, a, b)
+    return (liquidity * (b - p) / (p * b), liquidity * (p - a))
+
+
+def _liquidities(
+    sqrt_price: float, a: np.ndarray, b: np.ndarray, amount0: np.ndarray, amount1: np.ndarray
+) -> np.ndarray:
+    """
+    Float LiquidityAmounts.getLiquidityForAmounts, including prices outside of [a, b].
+    """
+    p0 = np.maximum(sqrt_price, a)
+    p1 = np.minimum(sqrt_price, b)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        liquidity0 = np.where(sqrt_price >= b, np.inf, amount0 * p0 * b / (b - p0))
+        liquidity1 = np.where(sqrt_price <= a, np.inf, amount1 / (p1 - a))
+    return np.minimum(liquidity0, liquidity1)
+
+
+def _occupancy(tick_before: int, tick_after: int, tick_lower: np.ndarray, tick_upper: np.ndarray) -> np.ndarray:
+    """
+    Fraction of the period between rows the pool tick spent in [tick_lower, tick_upper),
+    assuming the tick moved linearly from tick_before to tick_after.
+    """
+    if tick_before == tick_after:
+        return ((tick_lower <= tick_before) & (tick_before < tick_upper)).astype(float)
+
+    (lo, hi) = (min(tick_before, tick_after), max(tick_before, tick_after))
+    return np.clip(np.minimum(tick_upper, hi) - np.maximum(tick_lower, lo), 0, None) / (hi - lo)
+
+
+def _amounts_after_rebalance(
+    sqrt_price: float, liquidity: float, ef: float, amount0: np.ndarray, amount1: np.ndarray
+) -> (np.ndarray, np.ndarray):
+    """
+    Float UniswapV3LPSimpleRunner._calculate_position_amounts_after_rebalance.
+    """
+    price = sqrt_price**2
+    value1 = amount0 * price + amount1
+    x1 = liquidity * sqrt_price
+
+    amount1_after = value1 / 2
+    dx1 = amount1_after - amount1
+    eps1 = -np.abs(dx1) * (ef / 2 + (1 / 2) * np.abs(dx1) / x1)
+
+    amount1_after += eps1
+    amount0_after = amount1_after / price
+    unchanged = dx1 == 0
+    return (np.where(unchanged, amount0, amount0_after), np.where(unchanged, amount1, amount1_after))
+
+
+def replay(
+    series: pd.DataFrame,
+    tick_widths: npt.ArrayLike,
+    taus: npt.ArrayLike,
+    tick_spacing: int,
+    fee: int,
+    amount1: float,
+    compound_fees_at_rebalance: bool = False,
+) -> Dict[str, np.ndarray]:
+    """
+    Replays the UniswapV3LPSimpleRunner strategy over a series of pool states for every
+    (tick_width, tau) at once in floating point, for screening a parameter space before
+    confirming finalists with a runner.
+
+    Rebalances around the current tick every tau blocks, with the same amounts after
+    rebalance slippage model as the runner. Fee growth inside is approximated from the
+    fraction of each period between rows the pool tick spent in range, assuming the
+    tick moves linearly between rows. Unlike the runner, ticks are not widened to the
+    nearest initialized ticks and the position is initialized at the first row.
+
+    Args:
+        series (pd.DataFrame): Pool state at each row, with SERIES_COLUMNS, e.g. backtest records
+            read with `sink.read_records`
+        tick_widths (npt.ArrayLike): Tick widths to replay, 0 for full range
+        taus (npt.ArrayLike): Blocks between rebalances, broadcast with tick_widths
+        tick_spacing (int): Pool tick spacing
+        fee (int): Pool fee in pips
+        amount1 (float): Initial amount1 to LP with, as with runner kwarg amount1
+        compound_fees_at_rebalance (bool): Whether to add fees to principal at rebalance
+
+    Returns:
+        Dict[str, np.ndarray]: Each of OUTPUTS with shape of broadcast (tick_widths, taus) + (len(series),).
+            Values are in token units, with value the principal + fees since last rebalance in token1,
+            plus cumulative fees if not compounded.
+    """
+    (tick_widths, taus) = np.broadcast_arrays(np.asarray(tick_widths, dtype=np.int64), np.asarray(taus, dtype=np.int64))
+    shape = tick_widths.shape
+    (widths, taus) = (np.ravel(tick_widths), np.ravel(taus))
+    if np.any((widths // 2) % tick_spacing != 0):
+        raise ValueError("tick widths // 2 not multiples of tick spacing")
+
+    numbers = series["number"].to_numpy(dtype=np.int64)
+    ticks = series["tick"].to_numpy(dtype=np.int64)
+    sqrt_prices = np.array([int(v) / (1 << 96) for v in series["sqrtPriceX96"]])
+    liquidities = np.array([float(int(v)) for v in series["liquidity"]])
+    dgs = [_fee_growth_deltas(series[f"feeGrowthGlobal{i}X128"]) for i in range(2)]
+    ef = fee / 1e6
+
+    full_range = widths == 0
+    tick_max = MAX_TICK - (MAX_TICK % tick_spacing)
+
+    def lp_ticks(tick: int) -> (np.ndarray, np.ndarray):
+        # @dev same rounding to closest usable tick as runner _calculate_lp_ticks
+        remainder = tick % tick_spacing
+        tick = tick - remainder if remainder < tick_spacing // 2 else tick + (tick_spacing - remainder)
+        return (np.where(full_range, -tick_max, tick - widths // 2), np.where(full_range, tick_max, tick + widths // 2))
+
+    n = len(numbers)
+    k = len(widths)
+    outputs = {name: np.zeros((k, n)) for name in OUTPUTS}
+
+    # init position at first row with amount1 as runner does given amount1 only
+    (tick_lower, tick_upper) = lp_ticks(ticks[0])
+    (a, b) = (_sqrt_ratios(tick_lower), _sqrt_ratios(tick_upper))
+    liquidity = amount1 / (np.minimum(sqrt_prices[0], b) - a)
+    fees0 = np.zeros(k)
+    fees1 = np.zeros(k)
+    fees0_cumulative = np.zeros(k)
+    fees1_cumulative = np.zeros(k)
+    block_rebalance_last = np.full(k, numbers[0])
+
+    click.echo(f"Replaying {k} (tick_width, tau) combinations over {n} rows ...")
+    for i in range(n):
+        sqrt_price = sqrt_prices[i]
+        if i > 0:
+            occupancy = _occupancy(ticks[i - 1], ticks[i], tick_lower, tick_upper)
+            fees0 += liquidity * dgs[0][i] * occupancy
+            fees1 += liquidity * dgs[1][i] * occupancy
+
+        # record values prior to strategy update
+        (principal0, principal1) = _amounts(sqrt_price, a, b, liquidity)
+        price = sqrt_price**2
+        value = principal0 * price + principal1 + fees0 * price + fees1
+        if not compound_fees_at_rebalance:
+            value += fees0_cumulative * price + fees1_cumulative
+
+        for name, v in [
+            ("tick_lower", tick_lower),
+            ("tick_upper", tick_upper),
+            ("liquidity", liquidity),
+            ("principal0", principal0),
+            ("principal1", principal1),
+            ("fees0", fees0),
+            ("fees1", fees1),
+            ("fees0_cumulative", fees0_cumulative),
+            ("fees1_cumulative", fees1_cumulative),
+            ("value", value),
+        ]:
+            outputs[name][:, i] = v
+
+        # rebalance if tau passed and ticks changed or compounding
+        (tick_lower_next, tick_upper_next) = lp_ticks(ticks[i])
+        rebalance = numbers[i] >= block_rebalance_last + taus
+        if not compound_fees_at_rebalance:
+            rebalance &= (tick_lower_next != tick_lower) | (tick_upper_next != tick_upper)
+        if i == 0 or not np.any(rebalance):
+            continue
+
+        fees0_cumulative = np.where(rebalance, fees0_cumulative + fees0, fees0_cumulative)
+        fees1_cumulative = np.where(rebalance, fees1_cumulative + fees1, fees1_cumulative)
+        if compound_fees_at_rebalance:
+            (principal0, principal1) = (principal0 + fees0, principal1 + fees1)
+
+        (amount0_after, amount1_after) = _amounts_after_rebalance(
+            sqrt_price, liquidities[i], ef, principal0, principal1
+        )
+        (a_next, b_next) = (_sqrt_ratios(tick_lower_next), _sqrt_ratios(tick_upper_next))
+        liquidity_next = _liquidities(sqrt_price, a_next, b_next, amount0_after, amount1_after)
+
+        tick_lower = np.where(rebalance, tick_lower_next, tick_lower)
+        tick_upper = np.where(rebalance, tick_upper_next, tick_upper)
+        (a, b) = (_sqrt_ratios(tick_lower), _sqrt_ratios(tick_upper))
+        liquidity = np.where(rebalance, liquidity_next, liquidity)
+        fees0 = np.where(rebalance, 0, fees0)
+        fees1 = np.where(rebalance, 0, fees1)
+        block_rebalance_last = np.where(rebalance, numbers[i], block_rebalance_last)
+
+    return {name: v.reshape(shape + (n,)) for name, v in outputs.items()}
@@ -1,10 +1,12 @@
 from .full import UniswapV3LPFullRunner
 from .simple import UniswapV3LPSimpleRunner
 from .optimized import UniswapV3LPOptimizedRunner
+from .multi import UniswapV3LPMultiRunner
 
 
 __all__ = [
     "UniswapV3LPFullRunner",
     "UniswapV3LPSimpleRunner",
     "UniswapV3LPOptimizedRunner",
+    "UniswapV3LPMultiRunner",
 ]
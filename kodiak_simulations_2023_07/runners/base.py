@@ -1,9 +1,14 @@
 import click
+import copy
+import numpy as np
 import os
-import pandas as pd
 
-from typing import Any, List, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, ClassVar, Dict, Iterator, List, Mapping, Optional, Tuple
 
+from ape import chain
+from ape.exceptions import ContractLogicError, UnknownSnapshotError
+from ape.types import SnapshotID
 from backtest_ape.uniswap.v3 import UniswapV3LPBaseRunner
 from backtest_ape.setup import deploy_mock_erc20
 from backtest_ape.uniswap.v3.setup import (
@@ -11,16 +16,37 @@ from backtest_ape.uniswap.v3.setup import (
     deploy_mock_univ3_factory,
 )
 
-from ..constants import MAX_TICK
+from ..cache import RefCallCache
+from ..checkpoint import checkpoint_path, read_checkpoint, write_checkpoint
+from ..constants import MAX_TICK, MIN_TICK
+from ..engine import EngineRevertError
+from ..multicall import aggregate, has_multicall, inject_multicall
+from ..override import call_with_storage, get_mock_pool_storage, get_storage_word
+from ..sink import RecordSink, get_record_sink
 from .setup import create_mock_pool
 
 
+# snapshots of deployed mocks and backtester by ref pool, backtester and account for reuse across runs in process
+_MOCKS_SNAPSHOTS: Dict[Tuple, Tuple[SnapshotID, int, Any, Mapping, Any]] = {}
+
+
 # fixed tick width lp runner classes for backtesting
 class UniswapV3LPFixedWidthRunner(UniswapV3LPBaseRunner):
     liquidity: int = 0  # liquidity contribution by LP
     tick_width: int = 0  # 2 * delta
     blocks_between_rebalance: int = 0  # tau
     compound_fees_at_rebalance: bool = False
+    cache_path: str = ""  # path to sqlite cache of ref calls if any
+    cache_size: int = 1000000  # max number of ref calls to cache
+    multicall: bool = True  # whether to batch state reads per block through Multicall3
+    prefetch_depth: int = 0  # number of upcoming blocks to prefetch ref state for, 0 for no prefetch
+    prefetch_workers: int = 4  # max number of concurrent ref state prefetches
+    adaptive: bool = False  # whether to only visit decision relevant blocks, with step as max gap between records
+    record_flush_rows: int = 1000  # max number of records to buffer before writing
+    record_flush_seconds: float = 60  # max seconds between record writes
+    state_override: bool = False  # value backtester with eth_call state overrides instead of mock state txs
+    checkpoint_blocks: int = 0  # min blocks between checkpoints for resume, 0 for no checkpoints
+    reuse_mocks: bool = False  # whether to revert to a snapshot of mocks deployed by a prior run in process
 
     _tick_spacing: int = 0  # tick width around initial tick
     _token_id: int = -1  # current token id
@@ -30,6 +56,47 @@ class UniswapV3LPFixedWidthRunner(UniswapV3LPBaseRunner):
     _fees0_cumulative: int = 0  # tracks cumulative fees in token0
     _fees1_cumulative: int = 0  # tracks cumulatives fees in token1
 
+    _checkpoint_names: ClassVar[List[str]] = [
+        "_token_id",
+        "_last_number_processed",
+        "_block_rebalance_last",
+        "_fees0_cumulative",
+        "_fees1_cumulative",
+    ]  # internal fields to persist in checkpoints
+    _snapshot_names: ClassVar[List[str]] = [
+        "_mocks_state_last",
+        "_mock_slot0_word",
+        "_mocks_state_pending",
+    ]  # internal fields besides checkpointed ones to restore when a block reverts
+    _checkpoint_last: int = 0  # last block checkpointed
+    _backtest_kwargs: Mapping = {}  # args of backtest in progress
+
+    _cache: Optional[RefCallCache] = None
+    _multicall_from: Optional[int] = None  # earliest block known to have Multicall3 deployed
+    _multicall_before: int = -1  # latest block known to not have Multicall3 deployed
+    _prefetch_executor: Optional[ThreadPoolExecutor] = None
+    _prefetch: Dict[int, Tuple[Tuple[int, int], Future]] = {}  # block => (ticks prefetched with, ref state)
+    _prefetch_start: int = 0
+    _prefetch_stop: int = 0
+    _prefetch_step: int = 1
+    _prefetch_cursor: int = 0  # latest block read by the backtest loop
+    _prefetch_last: Optional[Tuple[Tuple[int, int], Mapping]] = None  # (ticks read with, ref state) at cursor
+    _prefetch_hits: int = 0
+    _prefetch_misses: int = 0
+    _prefetch_tick_rereads: int = 0  # prefetched states with tick info re-read after rebalance
+    _adaptive_visits: int = 0  # blocks visited in adaptive backtest
+    _sink: Optional[RecordSink] = None
+    _bitmap_number: int = -1  # block number of cached tick bitmap words
+    _bitmap_words: Dict[int, int] = {}  # ref pool tick bitmap words by word position at block
+    _mocks_state_last: Dict[Tuple, Tuple] = {}  # args last pushed to each mock pool setter, by setter and tick
+    _mocks_txs: int = 0  # mock state transactions sent
+    _mocks_txs_saved: int = 0  # mock state transactions skipped since nothing changed
+    _mocks_calls_saved: int = 0  # mock setter calls skipped since unchanged
+    _mocks_calldata_saved: int = 0  # bytes of setter calldata skipped
+    _mocks_state_pending: Optional[Mapping] = None  # ref state valued through state override but not pushed to mocks
+    _mock_slot0_word: Optional[int] = None  # mock pool slot0 storage word for state overrides
+    _override_calls: int = 0  # backtester calls with state override
+
     def __init__(self, **data: Any):
         """
         Overrides UniswapV3LPRunner to check tick width // 2 is a multiple of pool
@@ -40,11 +107,185 @@ class UniswapV3LPFixedWidthRunner(UniswapV3LPBaseRunner):
         if self.liquidity == 0 and (self.amount0 == 0 and self.amount1 == 0):
             raise ValueError("both self.liquidity and self.amounts == 0")
 
-        pool = self._refs["pool"]
-        self._tick_spacing = pool.tickSpacing()
+        if self.cache_path != "":
+            self._cache = RefCallCache(self.cache_path, chain.chain_id, self.cache_size)
+
+        self._tick_spacing = self._ref_call("pool", "tickSpacing")
         if (self.tick_width // 2) % self._tick_spacing != 0:
             raise ValueError("self.tick_width // 2 not a multiple of pool.tickSpacing")
 
+    def _has_multicall(self, number: Optional[int]) -> bool:
+        """
+        Whether Multicall3 is deployed at block number, checking the chain
+        only for blocks not already bounded by prior checks.
+        """
+        if number is None:
+            return has_multicall()
+        elif self._multicall_from is not None and number >= self._multicall_from:
+            return True
+        elif number <= self._multicall_before:
+            return False
+
+        deployed = has_multicall(number)
+        if deployed:
+            self._multicall_from = number if self._multicall_from is None else min(self._multicall_from, number)
+        else:
+            self._multicall_before = max(self._multicall_before, number)
+        return deployed
+
+    def _ref_calls(self, calls: List[Tuple[str, str, Tuple]], number: Optional[int] = None) -> List[Any]:
+        """
+        Calls view methods on reference contracts at block number, through the ref call
+        cache if any. Calls missing from the cache are batched into a single Multicall3
+        call if more than one and Multicall3 is deployed at block number.
+
+        Args:
+            calls (List[Tuple[str, str, Tuple]]): The (key of the reference contract in _refs, view method name, args)
+                of each call.
+            number (Optional[int]): The block number. If None, assumes results are immutable.
+
+        Returns:
+            List[Any]: The results of each call, in order.
+        """
+        results = [None] * len(calls)
+        misses = []
+        for i, (ref, method, args) in enumerate(calls):
+            if self._cache is not None:
+                (found, value) = self._cache.get(self._refs[ref], method, *args, block=number)
+                if found:
+                    results[i] = value
+                    continue
+
+            misses.append(i)
+
+        if len(misses) == 0:
+            return results
+
+        contract_calls = [(self._refs[calls[i][0]], calls[i][1], calls[i][2]) for i in misses]
+        if self.multicall and len(contract_calls) > 1 and self._has_multicall(number):
+            values = aggregate(contract_calls, number)
+        else:
+            kwargs = {} if number is None else {"block_identifier": number}
+            values = [getattr(contract, method)(*args, **kwargs) for contract, method, args in contract_calls]
+
+        for i, value in zip(misses, values):
+            if self._cache is not None:
+                (ref, method, args) = calls[i]
+                value = self._cache.put(self._refs[ref], method, *args, block=number, result=value)
+            results[i] = value
+
+        return results
+
+    def _ref_call(self, ref: str, method: str, *args: Any, number: Optional[int] = None) -> Any:
+        """
+        Calls view method on reference contract at block number, through the ref call
+        cache if any.
+
+        Args:
+            ref (str): The key of the reference contract in _refs.
+            method (str): The view method name.
+            number (Optional[int]): The block number. If None, assumes result is immutable.
+        """
+        return self._ref_calls([(ref, method, args)], number)[0]
+
+    def get_refs_state(self, number: Optional[int] = None) -> Mapping:
+        """
+        Overrides UniswapV3LPBaseRunner to read through the ref call cache
+        and batch reads into a single Multicall3 call. Uses ref state prefetched
+        for block number if any, re-reading tick info if ticks changed since.
+        Re-reads of the block being processed reuse its state, and blocks behind
+        the backtest loop are read without prefetching.
+
+        Args:
+            number (Optional[int]): The block number. If None, then last block
+                from current provider chain.
+
+        Returns:
+            Mapping: The state of references at block.
+        """
+        if number is None:
+            number = chain.blocks.head.number
+
+        ticks = (self.tick_lower, self.tick_upper)
+        if self._prefetch_executor is None:
+            return self._fetch_refs_state(number, *ticks)
+
+        # @dev e.g. position restore on resume
+        if number < self._prefetch_cursor:
+            return self._fetch_refs_state(number, *ticks)
+
+        # @dev e.g. re-read after rebalance
+        if number == self._prefetch_cursor and self._prefetch_last is not None:
+            (ticks_read, state) = self._prefetch_last
+        else:
+            self._prefetch_cursor = number
+            prefetched = self._prefetch.pop(number, None)
+            self._schedule_prefetch(number)
+            if prefetched is None:
+                self._prefetch_misses += 1
+                (ticks_read, state) = (ticks, self._fetch_refs_state(number, *ticks))
+            else:
+                self._prefetch_hits += 1
+                (ticks_read, future) = prefetched
+                state = future.result()
+            self._prefetch_last = (ticks_read, state)
+
+        if ticks_read != ticks:
+            self._prefetch_tick_rereads += 1
+            state = dict(state)
+            (state["tick_info_lower"], state["tick_info_upper"]) = self._ref_calls(
+                [("pool", "ticks", (self.tick_lower,)), ("pool", "ticks", (self.tick_upper,))], number
+            )
+
+        return state
+
+    def _fetch_refs_state(self, number: int, tick_lower: int, tick_upper: int) -> Mapping:
+        """
+        Reads the state of references at block number for the given ticks.
+        """
+        calls = [("pool", method, args) for (_, method, args) in self._state_calls(tick_lower, tick_upper)]
+        keys = [key for (key, _, _) in self._state_calls(tick_lower, tick_upper)]
+        return dict(zip(keys, self._ref_calls(calls, number)))
+
+    def _state_calls(self, tick_lower: int, tick_upper: int) -> List[Tuple[str, str, Tuple]]:
+        """
+        View method calls on the pool making up state.
+
+        Returns:
+            List[Tuple[str, str, Tuple]]: The (state key, view method name, args) of each call.
+        """
+        return [
+            ("slot0", "slot0", ()),
+            ("liquidity", "liquidity", ()),
+            ("fee_growth_global0_x128", "feeGrowthGlobal0X128", ()),
+            ("fee_growth_global1_x128", "feeGrowthGlobal1X128", ()),
+            ("tick_info_lower", "ticks", (tick_lower,)),
+            ("tick_info_upper", "ticks", (tick_upper,)),
+        ]
+
+    def _prefetch_blocks(self, number: int) -> Iterator[int]:
+        """
+        Upcoming blocks the backtest loop will process after block number,
+        up to prefetch depth.
+        """
+        first = self._prefetch_start + 1 if number == self._prefetch_start else number + self._prefetch_step
+        last = min(first + self.prefetch_depth * self._prefetch_step, self._prefetch_stop)
+        return iter(range(first, last, self._prefetch_step))
+
+    def _schedule_prefetch(self, number: int):
+        """
+        Schedules ref state fetches for upcoming blocks with current ticks. Pending fetches
+        with stale ticks are rescheduled if not yet started.
+        """
+        ticks = (self.tick_lower, self.tick_upper)
+        for n in self._prefetch_blocks(number):
+            if n in self._prefetch:
+                (ticks_prefetched, future) = self._prefetch[n]
+                if ticks_prefetched == ticks or not future.cancel():
+                    continue
+
+            self._prefetch[n] = (ticks, self._prefetch_executor.submit(self._fetch_refs_state, n, *ticks))
+
     def _calculate_lp_ticks(self, number: int, state: Mapping) -> (int, int):
         """
         Calculates anticipated tick upper and lower with fixed width around
@@ -78,37 +319,118 @@ class UniswapV3LPFixedWidthRunner(UniswapV3LPBaseRunner):
         (tick_lower, tick_upper) = self._find_nearest_lp_ticks(number, tick, tick_lower, tick_upper)
         return (tick_lower, tick_upper)
 
+    def _calculate_position_amounts_after_rebalance(
+        self, state: Mapping, amount0_before: int, amount1_before: int
+    ) -> (int, int):
+        """
+        Calculate position amounts to rebalance to.
+
+        Rebalance condition: price * amount0 == amount1
+
+        Args:
+            state (Mapping): The state of mocks
+        """
+        liquidity = state["liquidity"]
+        price = (int(state["slot0"].sqrtPriceX96) ** 2) / (1 << 192)
+        value1 = int(amount0_before * price + amount1_before)
+        x1 = (liquidity * state["slot0"].sqrtPriceX96) // (1 << 96)
+
+        amount1 = value1 // 2  # (1/2) * (dx * p + dy)
+        dx1 = amount1 - amount1_before  # (1/2) * |dx * p - dy|
+        if dx1 == 0:
+            return (amount0_before, amount1_before)
+
+        # correct for fee and second order slippage terms
+        fee = self._ref_call("pool", "fee")  # in bps
+        _f = fee / 1e6
+        eps1 = int(-abs(dx1) * (_f / 2 + (1 / 2) * abs(dx1) / x1))
+
+        amount1 += eps1
+        amount0 = int(amount1 / price)  # satisfies rebalance condition
+
+        click.echo("Calculating position amounts after rebalance ...")
+        click.echo(f"Amounts (before): {(amount0_before, amount1_before)}")
+        click.echo(f"Amounts (after): {(amount0, amount1)}")
+        click.echo(f"Value (before): {value1}")
+        click.echo(f"Value (after): {int(amount0 * price + amount1)}")
+
+        return (amount0, amount1)
+
     def _find_nearest_lp_ticks(self, number: int, tick: int, tick_lower: int, tick_upper: int) -> (int, int):
         """
         Finds nearest ticks to tick upper and lower in case given ticks are uninitialized.
         Widens the actual tick width LP uses if either tick is uninitialized in reference.
 
+        Widens symmetrically by tick spacing on each side until both ticks are initialized,
+        searching the reference pool tick bitmap rather than checking each tick.
+
         Args:
             tick (int): Tick to LP around
             tick_lower (int): Initial guess for tick lower to LP with
             tick_upper (int): Initial guess for tick upper to LP with
         """
         click.echo(f"Finding nearest initialized ticks to ({tick_lower}, {tick_upper}) at block {number} ...")
-        tick_width = tick_upper - tick_lower
-        pool = self._refs["pool"]
+        self._get_bitmap_words(number, [self._compress(tick_lower) >> 8, self._compress(tick_upper) >> 8])
 
-        found = False
-        while not found:
-            click.echo(f"Checking ({tick_lower}, {tick_upper}) at block {number} ...")
-            (_, _, _, _, _, _, _, lower_initialized) = pool.ticks(tick_lower)
-            (_, _, _, _, _, _, _, upper_initialized) = pool.ticks(tick_upper)
+        # @dev widen by smallest k such that both tick_lower - k * spacing and tick_upper + k * spacing initialized
+        k = -1
+        k_next = 0
+        while k_next != k:
+            k = k_next
+            lower = self._next_initialized_tick(number, tick_lower - k * self._tick_spacing, lte=True)
+            upper = self._next_initialized_tick(number, tick_upper + k * self._tick_spacing, lte=False)
+            k_next = max((tick_lower - lower) // self._tick_spacing, (upper - tick_upper) // self._tick_spacing)
 
-            click.echo(f"Lower initialized: {lower_initialized}")
-            click.echo(f"Upper initialized: {upper_initialized}")
+        (tick_lower, tick_upper) = (tick_lower - k * self._tick_spacing, tick_upper + k * self._tick_spacing)
+        click.echo(f"Found: ({tick_lower}, {tick_upper})")
+        return (tick_lower, tick_upper)
 
-            found = lower_initialized and upper_initialized
-            click.echo(f"Found: {found}")
-            if not found:
-                tick_width += 2 * self._tick_spacing
-                tick_lower = tick - tick_width // 2
-                tick_upper = tick + tick_width // 2
+    def _compress(self, tick: int) -> int:
+        """
+        Compressed tick for the pool tick bitmap.
+        """
+        return tick // self._tick_spacing
 
-        return (tick_lower, tick_upper)
+    def _get_bitmap_words(self, number: int, word_positions: List[int]) -> List[int]:
+        """
+        Gets the reference pool tick bitmap words at block number, reading words not
+        already read for the block in a single batch.
+        """
+        if number != self._bitmap_number:
+            self._bitmap_number = number
+            self._bitmap_words = {}
+
+        missing = [w for w in dict.fromkeys(word_positions) if w not in self._bitmap_words]
+        if len(missing) > 0:
+            words = self._ref_calls([("pool", "tickBitmap", (w,)) for w in missing], number)
+            self._bitmap_words.update(zip(missing, words))
+
+        return [self._bitmap_words[w] for w in word_positions]
+
+    def _next_initialized_tick(self, number: int, tick: int, lte: bool) -> int:
+        """
+        Finds the nearest initialized tick in the reference pool at block number that is
+        less than or equal to tick if lte, otherwise greater than or equal to tick.
+
+        Port of TickBitmap.nextInitializedTickWithinOneWord, continuing across words.
+        """
+        compressed = self._compress(tick)
+        (word_min, word_max) = (self._compress(MIN_TICK) >> 8, self._compress(MAX_TICK) >> 8)
+        (word_pos, bit_pos) = (compressed >> 8, compressed % 256)
+        while word_min <= word_pos <= word_max:
+            [word] = self._get_bitmap_words(number, [word_pos])
+            if lte:
+                masked = word & ((1 << (bit_pos + 1)) - 1)
+                if masked != 0:
+                    return ((word_pos << 8) + masked.bit_length() - 1) * self._tick_spacing
+                (word_pos, bit_pos) = (word_pos - 1, 255)
+            else:
+                masked = word >> bit_pos << bit_pos
+                if masked != 0:
+                    return ((word_pos << 8) + (masked & -masked).bit_length() - 1) * self._tick_spacing
+                (word_pos, bit_pos) = (word_pos + 1, 0)
+
+        raise ValueError(f"no initialized tick {'<=' if lte else '>='} {tick} at block {number}")
 
     def _get_mocks_state(self) -> Mapping:
         """
@@ -118,59 +440,168 @@ class UniswapV3LPFixedWidthRunner(UniswapV3LPBaseRunner):
             Mapping: The current state of mocks.
         """
         mock_pool = self._mocks["pool"]
-        state = {}
-
-        state["slot0"] = mock_pool.slot0()
-        state["liquidity"] = mock_pool.liquidity()
-        state["fee_growth_global0_x128"] = mock_pool.feeGrowthGlobal0X128()
-        state["fee_growth_global1_x128"] = mock_pool.feeGrowthGlobal1X128()
-        state["tick_info_lower"] = mock_pool.ticks(self.tick_lower)
-        state["tick_info_upper"] = mock_pool.ticks(self.tick_upper)
+        calls = [(mock_pool, method, args) for (_, method, args) in self._state_calls(self.tick_lower, self.tick_upper)]
+        values = (
+            aggregate(calls)
+            if self.multicall and has_multicall()
+            else [getattr(contract, method)(*args) for (contract, method, args) in calls]
+        )
 
-        return state
+        keys = [key for (key, _, _) in self._state_calls(self.tick_lower, self.tick_upper)]
+        return dict(zip(keys, values))
 
     def set_mocks_state(self, state: Mapping):
         """
         Overrides UniswapV3LPRunner to set based off deltas from prior ref state.
 
+        Only sends setter calls for mock pool state that changed since last pushed,
+        skipping the transaction entirely if nothing changed.
+
         Args:
             state (Mapping): The ref state at given block iteration.
         """
+        self._mocks_state_pending = None
+
         mock_pool = self._mocks["pool"]
-        datas = [
-            mock_pool.setSqrtPriceX96.as_transaction(state["slot0"].sqrtPriceX96).data,
-            mock_pool.setLiquidity.as_transaction(state["liquidity"]).data,
-            mock_pool.setFeeGrowthGlobalX128.as_transaction(
-                state["fee_growth_global0_x128"], state["fee_growth_global1_x128"]
-            ).data,
-            mock_pool.setTicks.as_transaction(
-                self.tick_lower,
-                state["tick_info_lower"].liquidityGross,
-                state["tick_info_lower"].liquidityNet,
-                state["tick_info_lower"].feeGrowthOutside0X128,
-                state["tick_info_lower"].feeGrowthOutside1X128,
-            ).data,
-            mock_pool.setTicks.as_transaction(
-                self.tick_upper,
-                state["tick_info_upper"].liquidityGross,
-                state["tick_info_upper"].liquidityNet,
-                state["tick_info_upper"].feeGrowthOutside0X128,
-                state["tick_info_upper"].feeGrowthOutside1X128,
-            ).data,
-        ]
+        datas = []
+        pushed = {}
+        for key, method, args in self._mocks_state_setters(state):
+            if self._mocks_state_last.get(key) == args:
+                # @dev setter args all static so calldata is selector + one word per arg
+                self._mocks_calls_saved += 1
+                self._mocks_calldata_saved += 4 + 32 * len(args)
+                continue
+
+            datas.append(getattr(mock_pool, method).as_transaction(*args).data)
+            pushed[key] = args
+
+        if len(datas) == 0:
+            self._mocks_txs_saved += 1
+            return
+
         mock_pool.calls(datas, sender=self.acc)
+        self._mocks_txs += 1
+        self._mocks_state_last.update(pushed)
+
+    def _mocks_state_setters(self, state: Mapping) -> List[Tuple[Tuple, str, Tuple]]:
+        """
+        Mock pool setter calls setting the mock pool to ref state for the position ticks.
+
+        Returns:
+            List[Tuple[Tuple, str, Tuple]]: The (key, setter name, args) of each call, keyed by setter and tick.
+        """
+        tick_info_lower = state["tick_info_lower"]
+        tick_info_upper = state["tick_info_upper"]
+        return [
+            (("setSqrtPriceX96",), "setSqrtPriceX96", (state["slot0"].sqrtPriceX96,)),
+            (("setLiquidity",), "setLiquidity", (state["liquidity"],)),
+            (
+                ("setFeeGrowthGlobalX128",),
+                "setFeeGrowthGlobalX128",
+                (state["fee_growth_global0_x128"], state["fee_growth_global1_x128"]),
+            ),
+            (
+                ("setTicks", self.tick_lower),
+                "setTicks",
+                (
+                    self.tick_lower,
+                    tick_info_lower.liquidityGross,
+                    tick_info_lower.liquidityNet,
+                    tick_info_lower.feeGrowthOutside0X128,
+                    tick_info_lower.feeGrowthOutside1X128,
+                ),
+            ),
+            (
+                ("setTicks", self.tick_upper),
+                "setTicks",
+                (
+                    self.tick_upper,
+                    tick_info_upper.liquidityGross,
+                    tick_info_upper.liquidityNet,
+                    tick_info_upper.feeGrowthOutside0X128,
+                    tick_info_upper.feeGrowthOutside1X128,
+                ),
+            ),
+        ]
+
+    def _invalidate_mocks_state(self):
+        """
+        Forgets mock pool state last pushed so the next set_mocks_state sends all setter calls.
+
+        Must be called after anything other than set_mocks_state changes mock pool state,
+        e.g. minting or burning liquidity on the mock pool.
+        """
+        self._mocks_state_last = {}
+        self._mock_slot0_word = None
+
+    def _sync_mocks_state(self):
+        """
+        Pushes ref state last valued through a state override to the mocks, if any.
+
+        Must be called before sending transactions or calls to the backtester that read mock
+        state outside of _get_backtester_values, e.g. on rebalance.
+        """
+        if self._mocks_state_pending is not None:
+            self.set_mocks_state(self._mocks_state_pending)
+
+    def _get_backtester_values(self, state: Mapping) -> List[int]:
+        """
+        Gets backtester values with mocks set to the given ref state.
+
+        If state_override, evaluates values as a single eth_call with the mock pool
+        storage overridden to ref state, so no mock state transaction is sent.
+        The ref state is then pushed to the mocks only when needed. See `_sync_mocks_state`.
+
+        Args:
+            state (Mapping): The ref state at given block iteration.
+
+        Returns:
+            List[int]: The values of the backtester for the state.
+        """
+        if not self.state_override:
+            self.set_mocks_state(state)
+            return self.backtester.values()
+
+        mock_pool = self._mocks["pool"]
+        if self._mock_slot0_word is None:
+            self._mock_slot0_word = get_storage_word(mock_pool.address, 0)
+
+        storage = get_mock_pool_storage(state, self.tick_lower, self.tick_upper, self._mock_slot0_word)
+        values = call_with_storage(self.backtester, "values", storage={mock_pool.address: storage})
+        self._override_calls += 1
+        self._mocks_state_pending = state
+        return values
 
     def record(self, path: str, number: int, state: Mapping, values: List[int]):
         """
         Overwrites UniswapV3LPRunner to record the value, some state at the given block,
         and liquidity + amounts backing LP's position.
 
+        Records are buffered and written in batches through a record sink chosen
+        by the file extension of path. See `sink.get_record_sink`.
+
         Args:
-            path (str): The path to the csv file to write the record to.
+            path (str): The path to the csv or arrow file to write the record to.
             number (int): The block number.
             state (Mapping): The state of references at block number.
             values (List[int]): The values of the backtester for the state.
         """
+        data = self._record_data(number, state, values)
+
+        if self._sink is None or self._sink.path != path:
+            self._open_sink(path)
+
+        # @dev prior block fully processed and recorded at this point so safe to checkpoint
+        if self.checkpoint_blocks > 0 and self._last_number_processed - self._checkpoint_last >= self.checkpoint_blocks:
+            self._write_checkpoint(self._last_number_processed)
+
+        self._sink.write(data)
+
+    def _record_data(self, number: int, state: Mapping, values: List[int]) -> Dict[str, Any]:
+        """
+        Record of the value, some state at the given block, and liquidity + amounts
+        backing LP's position, keyed by column name.
+        """
         data = {"number": number}
         for i, value in enumerate(values):
             data[f"values{i}"] = value
@@ -192,10 +623,104 @@ class UniswapV3LPFixedWidthRunner(UniswapV3LPBaseRunner):
                 "position_fees1_cumulative": self._fees1_cumulative,
             }
         )
+        return data
+
+    def _get_int64_columns(self) -> List[str]:
+        """
+        Int record columns known to fit in int64.
+        """
+        return ["number", "tick", "position_token_id", "position_tick_lower", "position_tick_upper"]
+
+    def _open_sink(self, path: str, append: bool = False):
+        """
+        Opens the record sink for path, closing any prior.
+        """
+        self._close_sink()
+        self._sink = get_record_sink(
+            path,
+            flush_rows=self.record_flush_rows,
+            flush_seconds=self.record_flush_seconds,
+            append=append,
+            int64_columns=self._get_int64_columns(),
+        )
 
-        header = not os.path.exists(path)
-        df = pd.DataFrame(data={k: [v] for k, v in data.items()})
-        df.to_csv(path, index=False, mode="a", header=header)
+    def _close_sink(self):
+        """
+        Writes any buffered records and closes the record sink.
+        """
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def _mocks_snapshot_key(self) -> Tuple:
+        """
+        Key of mocks and backtester deployed by runs identical to this one in setup.
+        """
+        return (
+            chain.chain_id,
+            self._refs["pool"].address,
+            self._backtester_name,
+            self.acc.address,
+            self.multicall,
+        )
+
+    def _restore_mocks_snapshot(self) -> bool:
+        """
+        Reverts the chain to the snapshot of mocks and backtester deployed by a prior run
+        on the same fork, if any, re-snapshotting for the next run.
+
+        Returns:
+            bool: Whether mocks were restored.
+        """
+        key = self._mocks_snapshot_key()
+        if key not in _MOCKS_SNAPSHOTS:
+            return False
+
+        # @dev snapshot invalid if fork reset since or reverted to an earlier snapshot
+        (snapshot_id, number, block_hash, mocks, backtester) = _MOCKS_SNAPSHOTS.pop(key)
+        try:
+            if number > chain.blocks.head.number or chain.blocks[number].hash != block_hash:
+                return False
+            chain.restore(snapshot_id)
+        except UnknownSnapshotError:
+            return False
+
+        click.echo(f"Reverted to snapshot of mocks deployed at block {number} ...")
+        self._mocks = mocks
+        self._backtester = backtester
+        self._invalidate_mocks_state()
+        self._save_mocks_snapshot()
+        return True
+
+    def _save_mocks_snapshot(self):
+        """
+        Snapshots the chain with mocks and backtester deployed for reuse by later runs.
+        """
+        head = chain.blocks.head
+        _MOCKS_SNAPSHOTS[self._mocks_snapshot_key()] = (
+            chain.snapshot(),
+            head.number,
+            head.hash,
+            self._mocks,
+            self._backtester,
+        )
+
+    def setup(self, mocking: bool = True):
+        """
+        Overrides UniswapV3LPBaseRunner to revert to the snapshot of mocks and backtester
+        deployed by a prior run in this process on the same fork instead of redeploying,
+        if reuse_mocks.
+        """
+        if not (mocking and self.reuse_mocks):
+            super().setup(mocking=mocking)
+            return
+
+        if self._restore_mocks_snapshot():
+            self._initialized = True
+            return
+
+        super().setup(mocking=mocking)
+        self._save_mocks_snapshot()
 
     def deploy_mocks(self):
         """
@@ -224,7 +749,7 @@ class UniswapV3LPFixedWidthRunner(UniswapV3LPBaseRunner):
 
         # create the pool through the mock univ3 factory
         pool = self._refs["pool"]
-        fee = pool.fee()
+        fee = self._ref_call("pool", "fee")
         sqrt_price_x96 = pool.slot0().sqrtPriceX96
         mock_pool = create_mock_pool(
             mock_factory,
@@ -240,3 +765,377 @@ class UniswapV3LPFixedWidthRunner(UniswapV3LPBaseRunner):
             "manager": mock_manager,
             "pool": mock_pool,
         }
+        self._invalidate_mocks_state()
+
+        # deploy multicall locally if necessary for batched mock state reads
+        if self.multicall:
+            click.echo("Injecting Multicall3 if not deployed ...")
+            inject_multicall()
+
+    def _get_tick_series(self, start: int, stop: int) -> (np.ndarray, np.ndarray):
+        """
+        Gets the ref pool tick at the end of each block with a swap between start and stop
+        from Swap logs.
+
+        Returns:
+            blocks (np.ndarray): The block numbers with swaps, ascending.
+            ticks (np.ndarray): The pool tick after the last swap in each block.
+        """
+        click.echo(f"Fetching Swap logs from block {start} to {stop} ...")
+        logs = [(log.block_number, log.tick) for log in self._refs["pool"].Swap.range(start, stop)]
+        if len(logs) == 0:
+            return (np.array([], dtype=int), np.array([], dtype=int))
+
+        (blocks, ticks) = (np.array(a, dtype=int) for a in zip(*logs))
+        last = np.append(blocks[1:] != blocks[:-1], True)  # last swap in each block
+        click.echo(f"Found {len(logs)} swaps in {np.sum(last)} blocks")
+        return (blocks[last], ticks[last])
+
+    def _round_ticks(self, ticks: np.ndarray) -> np.ndarray:
+        """
+        Rounds ticks to the closest tick spacing as in _calculate_lp_ticks.
+        """
+        remainder = ticks % self._tick_spacing
+        return np.where(
+            remainder < self._tick_spacing // 2, ticks - remainder, ticks + (self._tick_spacing - remainder)
+        )
+
+    def _next_overdue_block(self, number: int, tick: int, blocks: np.ndarray, ticks: np.ndarray, bound: int) -> int:
+        """
+        Next block before bound at which an overdue rebalance would change LP ticks,
+        given pool ticks at end of each block with swaps.
+
+        Args:
+            number (int): The block number last processed.
+            tick (int): The pool tick at block number.
+            blocks (np.ndarray): The block numbers with swaps in (number, bound).
+            ticks (np.ndarray): The pool tick at end of each block with swaps in (number, bound).
+            bound (int): The block number to default to if no change.
+        """
+        if self.compound_fees_at_rebalance:
+            return number + 1
+        elif self.tick_width == 0:
+            return bound
+
+        changed = np.flatnonzero(self._round_ticks(ticks) != self._round_ticks(np.array(tick)))
+        return int(blocks[changed[0]]) if len(changed) > 0 else bound
+
+    def _next_adaptive_block(self, number: int, tick: int, blocks: np.ndarray, ticks: np.ndarray, bound: int) -> int:
+        """
+        Next decision relevant block after block number: the rebalance deadline, the first
+        block the pool tick crosses position tick lower or upper, or the first block an overdue
+        rebalance would change LP ticks. Defaults to bound.
+
+        Args:
+            number (int): The block number last processed.
+            tick (int): The pool tick at block number.
+            blocks (np.ndarray): The block numbers with swaps, ascending.
+            ticks (np.ndarray): The pool tick at end of each block with swaps.
+            bound (int): The block number to default to if nothing relevant happens.
+        """
+        if self._block_rebalance_last == 0:
+            return number + 1
+
+        deadline = self._block_rebalance_last + self.blocks_between_rebalance
+        if deadline > number:
+            bound = min(bound, deadline)
+
+        lo = np.searchsorted(blocks, number, side="right")
+        hi = np.searchsorted(blocks, bound, side="left")
+        (blocks, ticks) = (blocks[lo:hi], ticks[lo:hi])
+
+        # side of position range pool tick is on: below, in range or above
+        sides = (ticks >= self.tick_lower).astype(int) + (ticks >= self.tick_upper)
+        side = int(tick >= self.tick_lower) + int(tick >= self.tick_upper)
+        crossed = np.flatnonzero(sides != side)
+        if len(crossed) > 0:
+            bound = int(blocks[crossed[0]])
+
+        if deadline <= number:
+            bound = min(bound, self._next_overdue_block(number, tick, blocks, ticks, bound))
+
+        return bound
+
+    def snapshot(self) -> (SnapshotID, Mapping):
+        """
+        Snapshots the chain along with runner fields and internal fields updated
+        while processing a block.
+
+        Returns:
+            snapshot_chain_id (SnapshotID): The id of the chain snapshot.
+            snapshot_runner_kwargs (Mapping): The runner attributes to restore.
+        """
+        names = list(self.__fields__.keys()) + self._checkpoint_names + self._snapshot_names
+        snapshot_runner_kwargs = {name: copy.copy(getattr(self, name)) for name in names}
+        return (chain.snapshot(), snapshot_runner_kwargs)
+
+    def restore(self, snapshot_chain_id: SnapshotID, snapshot_runner_kwargs: Mapping):
+        """
+        Restores the chain and runner attributes to those of a snapshot.
+
+        Args:
+            snapshot_chain_id (SnapshotID): The id of the chain snapshot.
+            snapshot_runner_kwargs (Mapping): The runner attributes to restore.
+        """
+        chain.restore(snapshot_chain_id)
+        for name, value in snapshot_runner_kwargs.items():
+            setattr(self, name, value)
+
+    def _process_block(self, path: str, number: int) -> Mapping:
+        """
+        Processes block number as in the UniswapV3LPBaseRunner backtest loop.
+
+        Returns:
+            Mapping: The state of references at block number.
+        """
+        click.echo(f"Processing block {number} ...")
+
+        # get the state of refs for vars care about at block.number
+        refs_state = self.get_refs_state(number)
+        click.echo(f"State of refs at block {number}: {refs_state}")
+
+        # set the state of mocks to refs state for vars and record values function on backtester
+        values = self._get_backtester_values(refs_state)
+        click.echo(f"Backtester values at block {number}: {values}")
+        self.record(path, number, refs_state, values)
+
+        # update backtested strategy based off new mock state, if needed
+        click.echo(f"Updating strategy at block {number} ...")
+        self.update_strategy(number, refs_state)
+
+        # replenish funds for acc
+        click.echo("Replenishing funds in account ...")
+        self.fund_account()
+
+        return refs_state
+
+    def _setup_backtest(self, start: int, stop: int):
+        """
+        Checks backtest args and sets up the runner as in the UniswapV3LPBaseRunner backtest.
+        """
+        if chain.provider.network.name != "mainnet-fork":
+            raise Exception("network not mainnet-fork.")
+
+        if start > stop:
+            raise ValueError("start block after stop block.")
+
+        click.echo("Setting up runner ...")
+        self.setup(mocking=True)
+
+        if not self._initialized:
+            raise Exception("runner not initialized.")
+
+    def _iterate_adaptive(self, path: str, number: int, stop: int, step: int, blocks: np.ndarray, ticks: np.ndarray):
+        """
+        Processes blocks from block number to stop, only visiting decision relevant blocks
+        given pool ticks at end of each block with swaps, and at most step blocks apart.
+        """
+        click.echo(f"Iterating adaptively from block number {number} to {stop} with max step size {step} ...")
+        while number < stop:
+            (snapshot_chain_id, snapshot_runner_kwargs) = self.snapshot()
+            try:
+                refs_state = self._process_block(path, number)
+            except (ContractLogicError, EngineRevertError) as err:
+                click.echo(f"Backtester reverted at block {number}: {err}. Restoring snapshot ...")
+                self.restore(snapshot_chain_id, snapshot_runner_kwargs)
+                refs_state = self.get_refs_state(number)
+
+            self._adaptive_visits += 1
+
+            bound = min(number + step, stop)
+            number = self._next_adaptive_block(number, refs_state["slot0"].tick, blocks, ticks, bound)
+
+        click.echo(f"Visited {self._adaptive_visits} blocks")
+
+    def _iterate(self, path: str, number: int, stop: int, step: int):
+        """
+        Processes blocks from block number to stop with step size step.
+        """
+        click.echo(f"Iterating from block number {number} to {stop} with step size {step} ...")
+        for n in range(number, stop, step):
+            (snapshot_chain_id, snapshot_runner_kwargs) = self.snapshot()
+            try:
+                self._process_block(path, n)
+            except (ContractLogicError, EngineRevertError) as err:
+                click.echo(f"Backtester reverted at block {n}: {err}. Restoring snapshot ...")
+                self.restore(snapshot_chain_id, snapshot_runner_kwargs)
+
+    def _backtest(self, path: str, start: int, stop: int, step: int = 1):
+        """
+        Backtests strategy between start and stop blocks using mocks, as in the
+        UniswapV3LPBaseRunner backtest but processing each block through _process_block.
+
+        If adaptive, only visits blocks where something decision relevant happens
+        according to a pre-pass over the pool's Swap logs, and at most step blocks apart.
+
+        Args:
+            path (str): The path to the csv file to write the record to.
+            start (int): The start block number.
+            stop (int): The stop block number.
+            step (int): The step size, or max gap between visited blocks if adaptive.
+        """
+        self._setup_backtest(start, stop)
+        if self.adaptive:
+            (blocks, ticks) = self._get_tick_series(start + 1, stop)
+
+        click.echo(f"Initializing state of mocks from block number {start} ...")
+        self.init_mocks_state(start, self.get_refs_state(start))
+
+        if self.adaptive:
+            self._iterate_adaptive(path, start + 1, stop, step, blocks, ticks)
+        else:
+            self._iterate(path, start + 1, stop, step)
+
+    def _write_checkpoint(self, number: int):
+        """
+        Atomically writes a checkpoint of runner fields, internal fields and position
+        beside the records, after flushing and fsyncing records up to block number.
+
+        Args:
+            number (int): The last block fully processed and recorded.
+        """
+        path = self._backtest_kwargs["path"]
+        click.echo(f"Checkpointing backtest at block {number} ...")
+        self._sink.checkpoint()
+
+        data = {
+            "runner": type(self).__name__,
+            "number": number,
+            "backtest": dict(self._backtest_kwargs),
+            "records_size": self._sink.size(),
+            "fields": self.dict(),
+            "internal": {name: getattr(self, name) for name in self._checkpoint_names},
+        }
+        write_checkpoint(checkpoint_path(path), data)
+        self._checkpoint_last = number
+
+    def _restore_position(self):
+        """
+        Restores the backtester position after internal fields restored from checkpoint.
+        """
+        raise NotImplementedError("resume not implemented for runner.")
+
+    def _start_backtest(self, path: str, start: int, stop: int, step: int):
+        """
+        Stores backtest args and starts prefetching if prefetch depth > 0.
+        """
+        self._backtest_kwargs = {"path": path, "start": start, "stop": stop, "step": step}
+
+        if self.adaptive and self.prefetch_depth > 0:
+            click.echo("Prefetch not supported with adaptive stepping. Ignoring prefetch depth ...")
+
+        if self.prefetch_depth > 0 and not self.adaptive:
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=self.prefetch_workers)
+            self._prefetch = {}
+            self._prefetch_start = start
+            self._prefetch_stop = stop
+            self._prefetch_step = step
+            self._prefetch_cursor = start
+            self._prefetch_last = None
+
+    def _end_backtest(self):
+        """
+        Writes any buffered records and stops prefetching.
+        """
+        self._close_sink()
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown(wait=True, cancel_futures=True)
+            self._prefetch_executor = None
+            self._prefetch = {}
+            self._prefetch_last = None
+
+    def _echo_backtest_stats(self):
+        """
+        Reports prefetch, mock state push, state override and ref call cache stats.
+        """
+        if self._prefetch_hits + self._prefetch_misses > 0:
+            click.echo(
+                f"Prefetch hits: {self._prefetch_hits}, misses: {self._prefetch_misses}, "
+                + f"tick info re-reads: {self._prefetch_tick_rereads}"
+            )
+
+        if self._mocks_txs + self._mocks_txs_saved > 0:
+            click.echo(
+                f"Mock state txs: {self._mocks_txs}, skipped: {self._mocks_txs_saved}, "
+                + f"setter calls skipped: {self._mocks_calls_saved}, calldata bytes saved: {self._mocks_calldata_saved}"
+            )
+
+        if self._override_calls > 0:
+            click.echo(f"State override calls: {self._override_calls}")
+
+        if self._cache is not None:
+            self._cache.flush()
+            count = self._cache.hits + self._cache.misses
+            hit_rate = self._cache.hits / count if count > 0 else 0
+            click.echo(
+                f"Ref calls: {count}, cache hits: {self._cache.hits}, misses: {self._cache.misses}, "
+                + f"evictions: {self._cache.evictions}, hit rate: {hit_rate}"
+            )
+
+    def backtest(self, path: str, start: int, stop: Optional[int] = None, step: int = 1):
+        """
+        Overrides UniswapV3LPBaseRunner to step adaptively if adaptive, otherwise prefetch
+        ref state for upcoming blocks while processing the current block if prefetch depth > 0.
+        Checkpoints every checkpoint_blocks for resume if > 0. Writes any buffered records and
+        reports ref call cache stats at the end of the backtest.
+        """
+        if stop is None:
+            stop = chain.blocks.head.number
+
+        self._start_backtest(path, start, stop, step)
+        self._checkpoint_last = start
+        try:
+            self._backtest(path, start, stop, step)
+        finally:
+            self._end_backtest()
+
+        self._echo_backtest_stats()
+
+    def resume(self, path: str):
+        """
+        Resumes backtest from the checkpoint at path, continuing from the block after
+        the last checkpointed one. Records written after the checkpoint are discarded
+        so no rows are duplicated.
+
+        Runner should be initialized with the fields stored in the checkpoint.
+
+        Args:
+            path (str): The path to the checkpoint file.
+        """
+        checkpoint = read_checkpoint(path)
+        for name, value in checkpoint["internal"].items():
+            setattr(self, name, tuple(value) if isinstance(value, list) else value)
+
+        kwargs = checkpoint["backtest"]
+        (path, start, stop, step) = (kwargs["path"], kwargs["start"], kwargs["stop"], kwargs["step"])
+        number = checkpoint["number"]
+        self._checkpoint_last = number
+
+        # discard records after checkpoint
+        if os.path.exists(path) and os.path.getsize(path) > checkpoint["records_size"]:
+            click.echo(f"Truncating records at {path} to last checkpoint ...")
+            os.truncate(path, checkpoint["records_size"])
+
+        self._start_backtest(path, start, stop, step)
+        self._prefetch_cursor = number
+        try:
+            self._setup_backtest(start, stop)
+            self._open_sink(path, append=True)
+
+            click.echo(f"Restoring position as of block number {number} ...")
+            self._restore_position()
+
+            if self.adaptive:
+                (blocks, ticks) = self._get_tick_series(start + 1, stop)
+                next_number = start + 1
+                if number > start:
+                    tick = self.get_refs_state(number)["slot0"].tick
+                    next_number = self._next_adaptive_block(number, tick, blocks, ticks, min(number + step, stop))
+
+                self._iterate_adaptive(path, next_number, stop, step, blocks, ticks)
+            else:
+                self._iterate(path, start + 1 if number == start else number + step, stop, step)
+        finally:
+            self._end_backtest()
+
+        self._echo_backtest_stats()
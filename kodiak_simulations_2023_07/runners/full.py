@@ -1,4 +1,7 @@
-from typing import ClassVar, Mapping
+import click
+
+from ape import chain
+from typing import Any, ClassVar, List, Mapping, Tuple
 
 from backtest_ape.uniswap.v3.lp.mgmt import mint_lp_position
 from backtest_ape.uniswap.v3.lp.setup import approve_mock_tokens, mint_mock_tokens
@@ -9,6 +12,7 @@ from ..utils import (
     get_amounts_for_liquidity,
     get_liquidity_for_amount0,
     get_liquidity_for_amount1,
+    get_tick_at_sqrt_ratio,
 )
 
 
@@ -16,6 +20,16 @@ from ..utils import (
 class UniswapV3LPFullRunner(UniswapV3LPFixedWidthRunner):
     _backtester_name: ClassVar[str] = "UniswapV3LPFullBacktest"
 
+    def __init__(self, **data: Any):
+        """
+        Overrides UniswapV3LPFixedWidthRunner to check unsupported options are not set.
+        """
+        super().__init__(**data)
+
+        # @dev position restore on resume not implemented for minted positions
+        if self.checkpoint_blocks > 0:
+            raise ValueError("self.checkpoint_blocks not supported with full runner")
+
     def _get_position_liquidity(self, token_id: int) -> int:
         """
         Gets the liquidity backing the position associated with the given token id.
@@ -115,6 +129,8 @@ class UniswapV3LPFullRunner(UniswapV3LPFixedWidthRunner):
             [self.amount0, self.amount1],
             self.acc,
         )
+        self._invalidate_mocks_state()  # @dev mint changes mock pool liquidity, tick info
+
         token_id = self.backtester.count() + 1
         self._token_id = token_id
 
@@ -134,6 +150,9 @@ class UniswapV3LPFullRunner(UniswapV3LPFixedWidthRunner):
         Rebalances symmetrically around current tick, with
           - tick_lower = tick_current - tick_width // 2
           - tick_upper = tick_current + tick_width // 2
+
+        Removes all liquidity from and collects the current position, swaps toward
+        the target amounts, then mints a new position, all in one backtester multicall.
         """
         # set block as processed
         self._last_number_processed = number  # TODO: move to set_mocks_state(number, state)
@@ -144,4 +163,138 @@ class UniswapV3LPFullRunner(UniswapV3LPFixedWidthRunner):
         elif number < self._block_rebalance_last + self.blocks_between_rebalance:
             return
 
-        # TODO: implement
+        # calculate new tick range to rebalance around
+        # @dev simply keep passively LPing if tick range same and no compounding of fees
+        tick_lower, tick_upper = self._calculate_lp_ticks(number, state)
+        if self.tick_lower == tick_lower and self.tick_upper == tick_upper and not self.compound_fees_at_rebalance:
+            return
+
+        click.echo(f"Rebalancing LP position at block {number} ...")
+        self._sync_mocks_state()
+        (principal0, principal1, fees0, fees1) = self.backtester.values()
+
+        # add to runner stored cumulative fees
+        self._fees0_cumulative += fees0
+        self._fees1_cumulative += fees1
+
+        # add fees to principal amounts if compound at rebalance
+        (amount0_before, amount1_before) = (principal0, principal1)
+        if self.compound_fees_at_rebalance:
+            amount0_before += fees0
+            amount1_before += fees1
+
+        (amount0, amount1) = self._calculate_position_amounts_after_rebalance(state, amount0_before, amount1_before)
+
+        # remove liquidity from current position with mocks set to ref state plus this position
+        calls = self._position_mocks_setters_calls(state, self.liquidity)
+        calls += self._remove_position_calls(self._token_id, self.liquidity)
+        calls += self._swap_calls(amount0 - amount0_before, amount1 - amount1_before)
+
+        # then mint the new position with mocks set to ref state at the new ticks
+        self.tick_lower = tick_lower
+        self.tick_upper = tick_upper
+        state = self.get_refs_state(number)
+        # @dev mock manager token ids sequential and backtester count stays at one after replace
+        token_id = self._token_id + 1
+        calls += self._position_mocks_setters_calls(state, 0)
+        calls += self._mint_position_calls(token_id, amount0, amount1)
+
+        (targets, datas) = zip(*calls)
+        self.backtester.multicall(list(targets), list(datas), [0 for _ in calls], sender=self.acc)
+        self._invalidate_mocks_state()  # @dev burn, mint change mock pool liquidity, tick info
+
+        self._token_id = token_id
+        self.amount0 = amount0
+        self.amount1 = amount1
+        self.liquidity = self._get_position_liquidity(token_id)
+
+        click.echo(f"Runner token id: {self._token_id}")
+        click.echo(f"Runner liquidity: {self.liquidity}")
+        click.echo(f"Runner amounts: {(self.amount0, self.amount1)}")
+        click.echo(f"values: {self.backtester.values()}")
+
+        # set position as rebalanced
+        self._block_rebalance_last = number
+
+    def _position_mocks_setters_calls(self, state: Mapping, liquidity: int) -> List[Tuple[str, bytes]]:
+        """
+        Mock pool setter calls setting the mock pool to ref state with liquidity of a position
+        in the current ticks added, so the position can be burned without underflow.
+
+        Returns:
+            List[Tuple[str, bytes]]: The (target, data) of each call.
+        """
+        mock_pool = self._mocks["pool"]
+        tick = get_tick_at_sqrt_ratio(state["slot0"].sqrtPriceX96)
+        in_range = self.tick_lower <= tick < self.tick_upper
+
+        calls = []
+        for key, method, args in self._mocks_state_setters(state):
+            if key == ("setLiquidity",) and in_range:
+                args = (args[0] + liquidity,)
+            elif key == ("setTicks", self.tick_lower):
+                args = (args[0], args[1] + liquidity, args[2] + liquidity) + args[3:]
+            elif key == ("setTicks", self.tick_upper):
+                args = (args[0], args[1] + liquidity, args[2] - liquidity) + args[3:]
+            calls.append((mock_pool.address, getattr(mock_pool, method).as_transaction(*args).data))
+        return calls
+
+    def _remove_position_calls(self, token_id: int, liquidity: int) -> List[Tuple[str, bytes]]:
+        """
+        Manager calls removing all liquidity from the position and collecting principal and fees to backtester.
+
+        Returns:
+            List[Tuple[str, bytes]]: The (target, data) of each call.
+        """
+        manager = self._mocks["manager"]
+        deadline = chain.blocks.head.timestamp + 86400
+        return [
+            (manager.address, manager.decreaseLiquidity.as_transaction((token_id, liquidity, 0, 0, deadline)).data),
+            (
+                manager.address,
+                manager.collect.as_transaction((token_id, self.backtester.address, 2**128 - 1, 2**128 - 1)).data,
+            ),
+        ]
+
+    def _swap_calls(self, amount0_delta: int, amount1_delta: int) -> List[Tuple[str, bytes]]:
+        """
+        Mock token calls swapping backtester balances by the given deltas, net of fees and slippage.
+
+        @dev modeled as burning the token sold and minting the token bought, since swapping through
+        the mock pool would move its state away from ref state
+        """
+        calls = []
+        for token, delta in zip(self._mocks["tokens"], [amount0_delta, amount1_delta]):
+            if delta > 0:
+                calls.append((token.address, token.mint.as_transaction(self.backtester.address, delta).data))
+            elif delta < 0:
+                calls.append((token.address, token.burn.as_transaction(self.backtester.address, -delta).data))
+        return calls
+
+    def _mint_position_calls(self, token_id: int, amount0: int, amount1: int) -> List[Tuple[str, bytes]]:
+        """
+        Manager call minting a new position in the current ticks to backtester, and backtester
+        call replacing the stored token id of the burned position with its token id.
+
+        Returns:
+            List[Tuple[str, bytes]]: The (target, data) of each call.
+        """
+        manager = self._mocks["manager"]
+        mock_pool = self._mocks["pool"]
+        params = (
+            mock_pool.token0(),
+            mock_pool.token1(),
+            mock_pool.fee(),
+            self.tick_lower,
+            self.tick_upper,
+            amount0,
+            amount1,
+            0,
+            0,
+            self.backtester.address,
+            chain.blocks.head.timestamp + 86400,
+        )
+        return [
+            (manager.address, manager.mint.as_transaction(params).data),
+            (self.backtester.address, self.backtester.replace.as_transaction(token_id).data),
+        ]
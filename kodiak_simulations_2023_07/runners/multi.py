@@ -0,0 +1,245 @@
+import click
+import copy
+
+from ape import chain
+from ape.types import SnapshotID
+from contextlib import contextmanager
+from typing import Any, ClassVar, Dict, Iterator, List, Mapping, Optional
+
+from .simple import UniswapV3LPSimpleRunner
+from ..engine import UniswapV3LPSimpleEngine
+
+
+# Multiple fixed tick width lp positions runner class for simple backtesting in one pass
+class UniswapV3LPMultiRunner(UniswapV3LPSimpleRunner):
+    tick_widths: List[int] = []  # tick width of each position, 0 for full range
+    engine: str = "native"
+
+    # runner attributes swapped in for the position being processed
+    _position_names: ClassVar[List[str]] = [
+        "tick_width",
+        "tick_lower",
+        "tick_upper",
+        "liquidity",
+        "amount0",
+        "amount1",
+        "_backtester",
+        "_block_rebalance_last",
+        "_fees0_cumulative",
+        "_fees1_cumulative",
+        "_block_position_last",
+        "_fee_growth_inside0_x128",
+        "_fee_growth_inside1_x128",
+    ]
+
+    _positions: List[Dict[str, Any]] = []  # attributes of each position when not being processed
+    _position_index: int = -1  # position being processed, -1 for none
+    _refs_state_number: int = -1  # block number of cached ref state
+    _refs_state_shared: Optional[Mapping] = None  # ref state common to all positions at block
+    _refs_tick_infos: Dict[int, Any] = {}  # ref tick info by tick at block
+
+    def __init__(self, **data: Any):
+        """
+        Overrides UniswapV3LPSimpleRunner to check each tick width // 2 is a multiple
+        of pool tick spacing and unsupported options are not set.
+        """
+        super().__init__(**data)
+
+        if len(self.tick_widths) == 0:
+            raise ValueError("self.tick_widths empty")
+
+        for tick_width in self.tick_widths:
+            if (tick_width // 2) % self._tick_spacing != 0:
+                raise ValueError(f"tick width {tick_width} // 2 not a multiple of pool.tickSpacing")
+
+        # @dev these assume a single position or evm backtester
+        if self.engine != "native":
+            raise ValueError("self.engine not 'native'")
+
+        for name in ["adaptive", "prefetch_depth", "checkpoint_blocks", "what_if_tick_widths"]:
+            if getattr(self, name):
+                raise ValueError(f"self.{name} not supported with multiple positions")
+
+    def setup(self, mocking: bool = True):
+        """
+        Overrides UniswapV3LPSimpleRunner to set up a native engine for each position.
+        """
+        super().setup(mocking=mocking)
+
+        click.echo(f"Setting up positions with tick widths {self.tick_widths} ...")
+        self._positions = []
+        for tick_width in self.tick_widths:
+            position = {name: getattr(self, name) for name in self._position_names}
+            position.update({"tick_width": tick_width, "_backtester": UniswapV3LPSimpleEngine()})
+            self._positions.append(position)
+
+    @contextmanager
+    def _position(self, i: int) -> Iterator[None]:
+        """
+        Swaps in the attributes of position i for the duration of the context, so
+        UniswapV3LPSimpleRunner methods act on that position alone.
+
+        Args:
+            i (int): The index of the position.
+        """
+        saved = {name: getattr(self, name) for name in self._position_names}
+        for name, value in self._positions[i].items():
+            setattr(self, name, value)
+        self._position_index = i
+
+        try:
+            yield
+        finally:
+            self._positions[i] = {name: getattr(self, name) for name in self._position_names}
+            for name, value in saved.items():
+                setattr(self, name, value)
+            self._position_index = -1
+
+    def snapshot(self) -> (SnapshotID, Mapping):
+        """
+        Overrides UniswapV3LPSimpleRunner to include the attributes of each position,
+        with a copy of its native engine since engine state is updated in place.
+        """
+        (snapshot_chain_id, snapshot_runner_kwargs) = super().snapshot()
+        snapshot_runner_kwargs.update(
+            {"_positions": [dict(p, _backtester=copy.copy(p["_backtester"])) for p in self._positions]}
+        )
+        return (snapshot_chain_id, snapshot_runner_kwargs)
+
+    def get_refs_state(self, number: Optional[int] = None) -> Mapping:
+        """
+        Overrides UniswapV3LPFixedWidthRunner to read ref state common to all positions
+        once per block, along with tick info for the ticks of every position in the same batch.
+        Tick info for ticks of a position after rebalance is read on demand.
+
+        Returns tick info lower and upper for the position being processed, if any, and
+        tick info by tick for all positions.
+
+        Args:
+            number (Optional[int]): The block number. If None, then last block
+                from current provider chain.
+
+        Returns:
+            Mapping: The state of references at block.
+        """
+        if number is None:
+            number = chain.blocks.head.number
+
+        if number != self._refs_state_number:
+            self._refs_state_number = number
+            self._refs_state_shared = None
+            self._refs_tick_infos = {}
+
+        # @dev positions not yet initialized have tick lower == tick upper
+        ticks = set()
+        for p in self._positions:
+            if p["tick_lower"] != p["tick_upper"]:
+                ticks.update([p["tick_lower"], p["tick_upper"]])
+        if self._position_index >= 0:
+            ticks.update([self.tick_lower, self.tick_upper])
+        ticks = sorted(tick for tick in ticks if tick not in self._refs_tick_infos)
+
+        calls = [("pool", "ticks", (tick,)) for tick in ticks]
+        keys = []
+        if self._refs_state_shared is None:
+            shared_calls = [c for c in self._state_calls(0, 0) if c[1] != "ticks"]
+            keys = [key for (key, _, _) in shared_calls]
+            calls = [("pool", method, args) for (_, method, args) in shared_calls] + calls
+
+        if len(calls) > 0:
+            values = self._ref_calls(calls, number)
+            if len(keys) > 0:
+                self._refs_state_shared = dict(zip(keys, values[: len(keys)]))
+            self._refs_tick_infos.update(zip(ticks, values[len(keys) :]))
+
+        state = dict(self._refs_state_shared, tick_infos=self._refs_tick_infos)
+        return self._position_state(state) if self._position_index >= 0 else state
+
+    def _position_state(self, state: Mapping) -> Mapping:
+        """
+        Ref state with tick info lower and upper for the position being processed.
+        """
+        tick_infos = state["tick_infos"]
+        return dict(state, tick_info_lower=tick_infos[self.tick_lower], tick_info_upper=tick_infos[self.tick_upper])
+
+    def init_mocks_state(self, number: int, state: Mapping):
+        """
+        Overrides UniswapV3LPSimpleRunner to initialize each position.
+        """
+        for i in range(len(self._positions)):
+            click.echo(f"Initializing position {i} with tick width {self._positions[i]['tick_width']} ...")
+            with self._position(i):
+                super().init_mocks_state(number, state)
+
+        self._last_number_processed = number
+
+    def _get_backtester_values(self, state: Mapping) -> List[List[int]]:
+        """
+        Overrides UniswapV3LPFixedWidthRunner to get values of each position.
+
+        Returns:
+            List[List[int]]: The values of the backtester for each position.
+        """
+        values = []
+        for i in range(len(self._positions)):
+            with self._position(i):
+                self.set_mocks_state(self._position_state(state))
+                values.append(self.backtester.values())
+        return values
+
+    def update_strategy(self, number: int, state: Mapping):
+        """
+        Overrides UniswapV3LPSimpleRunner to update the strategy of each position.
+        """
+        for i in range(len(self._positions)):
+            with self._position(i):
+                super().update_strategy(number, self._position_state(state))
+
+        self._last_number_processed = number
+
+    def _restore_position(self):
+        """
+        Overrides UniswapV3LPSimpleRunner as resume not supported with multiple positions.
+        """
+        raise NotImplementedError("resume not implemented for runner.")
+
+    def _record_data(self, number: int, state: Mapping, values: List[List[int]]) -> Dict[str, Any]:
+        """
+        Overrides UniswapV3LPFixedWidthRunner to record values, liquidity + amounts
+        of each position, with columns of position i prefixed by "position{i}_".
+        """
+        data = {
+            "number": number,
+            "sqrtPriceX96": state["slot0"].sqrtPriceX96,
+            "tick": state["slot0"].tick,
+            "liquidity": state["liquidity"],
+            "feeGrowthGlobal0X128": state["fee_growth_global0_x128"],
+            "feeGrowthGlobal1X128": state["fee_growth_global1_x128"],
+        }
+        for i, position in enumerate(self._positions):
+            prefix = f"position{i}_"
+            for j, value in enumerate(values[i]):
+                data[f"{prefix}values{j}"] = value
+
+            data.update(
+                {
+                    f"{prefix}tick_width": position["tick_width"],
+                    f"{prefix}liquidity": position["liquidity"],
+                    f"{prefix}tick_lower": position["tick_lower"],
+                    f"{prefix}tick_upper": position["tick_upper"],
+                    f"{prefix}amount0": position["amount0"],
+                    f"{prefix}amount1": position["amount1"],
+                    f"{prefix}fees0_cumulative": position["_fees0_cumulative"],
+                    f"{prefix}fees1_cumulative": position["_fees1_cumulative"],
+                }
+            )
+        return data
+
+    def _get_int64_columns(self) -> List[str]:
+        """
+        Overrides UniswapV3LPFixedWidthRunner for int columns of each position.
+        """
+        columns = ["number", "tick"]
+        for i in range(len(self.tick_widths)):
+            columns += [f"position{i}_tick_width", f"position{i}_tick_lower", f"position{i}_tick_upper"]
+        return columns
@@ -1,10 +1,12 @@
 import click
 import numpy as np
 
-from typing import Any, Mapping
+from collections import OrderedDict
+from typing import Any, ClassVar, List, Mapping, Optional, Tuple
 
 from .simple import UniswapV3LPSimpleRunner
-from ..optimize import find_optimal_delta
+from ..optimize import find_optimal_deltas
+from ..surface import OptimalDeltaSurface
 
 
 # Simple lp runner class that optimizes tick width at each rebalance
@@ -13,16 +15,85 @@ class UniswapV3LPOptimizedRunner(UniswapV3LPSimpleRunner):
     sigma: float = 1  # GBM vol fit param per block
     max_tick_width: int = 0  # max tick width if not full range
     rewards: float = 0  # rewards per unit of external virtual liquidity
+    surface_path: str = ""  # path to precomputed optimal delta surface if any
+    memo_size: int = 256  # max number of solved optimal deltas to memoize
+    memo_rtol: float = 1e-3  # relative resolution to quantize el, theta to for memoization
+    quad_order: int = 0  # quadrature order for exact expected fees, 0 for closed-form approx
+
+    _checkpoint_names: ClassVar[List[str]] = UniswapV3LPSimpleRunner._checkpoint_names + [
+        "_memo_key_last",
+        "_memo_hits",
+        "_memo_misses",
+        "_memo_skips",
+        "_delta_last",
+        "_solver_nits",
+    ]
+
+    _surface: Optional[OptimalDeltaSurface] = None
+    _memo: Optional[OrderedDict] = None  # LRU memo of quantized (ef, el, theta) => (delta, value)
+    _memo_key_last: Optional[Tuple] = None  # quantized inputs at last optimization
+    _memo_hits: int = 0
+    _memo_misses: int = 0
+    _memo_skips: int = 0  # optimizations skipped since quantized inputs unchanged
+    _delta_last: Optional[float] = None  # warm start for next solve
+    _solver_nits: int = 0  # cumulative solver iterations
 
     def __init__(self, **data: Any):
         """
-        Overrides UniswapV3LPSimpleRunner to check providing either amount0 or amount1.
+        Overrides UniswapV3LPSimpleRunner to check providing either amount0 or amount1
+        and to load the optimal delta surface if given.
         """
         super().__init__(**data)
 
         if self.amount0 == 0 and self.amount1 == 0:
             raise ValueError("self.amounts == 0")
 
+        if self.surface_path != "":
+            self._surface = OptimalDeltaSurface.load(self.surface_path)
+            if self._surface.quad_order != self.quad_order:
+                raise ValueError("surface quad_order != self.quad_order")
+
+        self._memo = OrderedDict()
+
+    def _quantize(self, ef: float, el: float, theta: float) -> Tuple:
+        """
+        Quantizes optimization inputs to a relative resolution of memo_rtol for memoization.
+        """
+        return (ef, round(np.log(el) / self.memo_rtol), round(np.log(theta) / self.memo_rtol))
+
+    def _find_optimal_delta(self, key: Tuple) -> (float, float):
+        """
+        Finds optimal delta for quantized inputs, checking LRU memo first
+        then solving warm started from the last optimal delta on a miss.
+        """
+        if key in self._memo:
+            self._memo_hits += 1
+            self._memo.move_to_end(key)
+            click.echo("Optimal delta found in memo")
+            return self._memo[key]
+
+        self._memo_misses += 1
+
+        # solve at quantized inputs so memoized values are independent of insertion order
+        (ef, el, theta) = (key[0], np.exp(key[1] * self.memo_rtol), np.exp(key[2] * self.memo_rtol))
+        args = (self.mu, self.sigma, self.blocks_between_rebalance, ef, el, theta, self._tick_spacing)
+        if self._surface is not None:
+            (delta, value) = self._surface.query(*args)
+        else:
+            (delta, value, converged, nit) = find_optimal_deltas(
+                *args, x0=self._delta_last, full_output=True, quad_order=self.quad_order
+            )
+            (delta, value) = (float(delta), float(value))
+            self._solver_nits += int(nit)
+            click.echo(f"Result from Newton iteration warm started at {self._delta_last} ...")
+            click.echo(f"delta: {delta}, nit: {nit}, converged: {converged}")
+
+        self._memo[key] = (delta, value)
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+
+        return (delta, value)
+
     def _calculate_theta(self, number: int, state: Mapping) -> float:
         """
         Calculates average fee volume per unit of external liquidity
@@ -30,12 +101,15 @@ class UniswapV3LPOptimizedRunner(UniswapV3LPSimpleRunner):
         """
         tau = self.blocks_between_rebalance
         sqrt_price_x96 = state["slot0"].sqrtPriceX96
-        last_state = self.get_refs_state(number - tau)
 
-        theta0 = ((state["fee_growth_global0_x128"] - last_state["fee_growth_global0_x128"]) * sqrt_price_x96) / (
+        # @dev only fee growth globals needed from last state so skip full get_refs_state
+        last_fee_growth_global0_x128 = self._ref_call("pool", "feeGrowthGlobal0X128", number=number - tau)
+        last_fee_growth_global1_x128 = self._ref_call("pool", "feeGrowthGlobal1X128", number=number - tau)
+
+        theta0 = ((state["fee_growth_global0_x128"] - last_fee_growth_global0_x128) * sqrt_price_x96) / (
             tau * (1 << 224)
         )
-        theta1 = (state["fee_growth_global1_x128"] - last_state["fee_growth_global1_x128"]) / (
+        theta1 = (state["fee_growth_global1_x128"] - last_fee_growth_global1_x128) / (
             tau * sqrt_price_x96 * (1 << 32)
         )
         theta = (theta0 + theta1) / 2
@@ -60,7 +134,7 @@ class UniswapV3LPOptimizedRunner(UniswapV3LPSimpleRunner):
 
         click.echo(f"LP liquidity per unit of external liquidity: {el}")
 
-        fee = self._refs["pool"].fee()  # in bps
+        fee = self._ref_call("pool", "fee")  # in bps
         ef = fee / 1e6
 
         theta = self._calculate_theta(number, state)
@@ -74,17 +148,20 @@ class UniswapV3LPOptimizedRunner(UniswapV3LPSimpleRunner):
         click.echo(f"Min fee volume per unit of external liquidity for +EV: {theta_min}")
         if theta <= theta_min:
             self.tick_width = 0
+            self._memo_key_last = None
             return
 
-        (delta, value) = find_optimal_delta(
-            self.mu,
-            self.sigma,
-            self.blocks_between_rebalance,
-            ef,
-            el,
-            theta,
-            self._tick_spacing,
-        )
+        # skip entirely if inputs unchanged since last optimization
+        key = self._quantize(ef, el, theta)
+        if key == self._memo_key_last:
+            self._memo_skips += 1
+            click.echo(f"Inputs unchanged since last optimization. Keeping tick width: {self.tick_width}")
+            return
+
+        self._memo_key_last = key
+
+        (delta, value) = self._find_optimal_delta(key)
+        self._delta_last = delta
         click.echo(f"Optimal delta: {delta}")
         click.echo(f"Expected value at end of next period: {value}")
 
@@ -103,6 +180,14 @@ class UniswapV3LPOptimizedRunner(UniswapV3LPSimpleRunner):
 
         self.tick_width = tick_width
 
+    def _next_overdue_block(self, number: int, tick: int, blocks: np.ndarray, ticks: np.ndarray, bound: int) -> int:
+        """
+        Overrides UniswapV3LPSimpleRunner to visit every block when a rebalance is overdue,
+        since optimal tick width depends on fee volume over the trailing rebalance period
+        which changes block to block regardless of pool tick.
+        """
+        return number + 1
+
     def init_mocks_state(self, number: int, state: Mapping):
         """
         Overrides UniswapV3LPSimpleRunner to optimize tick width prior to
@@ -124,3 +209,18 @@ class UniswapV3LPOptimizedRunner(UniswapV3LPSimpleRunner):
 
         # usual strategy update procedure
         super().update_strategy(number, state)
+
+    def backtest(self, path: str, start: int, stop: Optional[int] = None, step: int = 1):
+        """
+        Overrides UniswapV3LPSimpleRunner to report optimization memo stats
+        at the end of the backtest.
+        """
+        super().backtest(path, start, stop, step)
+
+        count = self._memo_hits + self._memo_misses + self._memo_skips
+        hit_rate = (self._memo_hits + self._memo_skips) / count if count > 0 else 0
+        click.echo(
+            f"Optimizations: {count}, memo hits: {self._memo_hits}, skips: {self._memo_skips}, "
+            + f"misses: {self._memo_misses}, hit rate: {hit_rate}"
+        )
+        click.echo(f"Solver iterations: {self._solver_nits}")
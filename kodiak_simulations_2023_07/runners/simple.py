@@ -1,9 +1,14 @@
 import click
+import copy
+import os
 
+from ape import chain
 from ape.types import SnapshotID
-from typing import ClassVar, Mapping
+from typing import Any, ClassVar, Dict, List, Mapping, Optional
 
 from .base import UniswapV3LPFixedWidthRunner
+from ..engine import UniswapV3LPSimpleEngine
+from ..sink import RecordSink, get_record_sink
 from ..utils import (
     get_amounts_for_liquidity,
     get_liquidity_for_amounts,
@@ -13,9 +18,130 @@ from ..utils import (
 )
 
 
+def what_if_path(path: str) -> str:
+    """
+    Path to the what-if table for the backtest writing records to path, in the same record format.
+
+    Args:
+        path (str): The path to the file backtest records are written to.
+    """
+    (root, ext) = os.path.splitext(path)
+    return f"{root}.what_if{ext}"
+
+
 # Fixed tick width lp runner class for simple backtesting
 class UniswapV3LPSimpleRunner(UniswapV3LPFixedWidthRunner):
+    engine: str = "evm"  # "evm" for backtester contract on mocks, "native" for off-chain engine
+    what_if_tick_widths: List[int] = []  # candidate tick widths to value one period forward at each rebalance
     _backtester_name: ClassVar[str] = "UniswapV3LPSimpleBacktest"
+    _checkpoint_names: ClassVar[List[str]] = UniswapV3LPFixedWidthRunner._checkpoint_names + [
+        "_block_position_last",
+        "_fee_growth_inside0_x128",
+        "_fee_growth_inside1_x128",
+    ]
+
+    _block_position_last: int = 0  # last block position attributes established on backtester
+    _fee_growth_inside0_x128: int = 0  # fee growth inside stored on backtester at last update
+    _fee_growth_inside1_x128: int = 0
+
+    # runner attributes changed while valuing a what-if candidate, restored after
+    _what_if_names: ClassVar[List[str]] = [
+        "tick_width",
+        "tick_lower",
+        "tick_upper",
+        "liquidity",
+        "_backtester",
+        "_block_position_last",
+        "_fee_growth_inside0_x128",
+        "_fee_growth_inside1_x128",
+        "_mocks_state_last",
+        "_mock_slot0_word",
+        "_mocks_state_pending",
+    ]
+    _what_if_sink: Optional[RecordSink] = None
+    _what_if_branches: int = 0  # what-if candidates valued
+
+    def __init__(self, **data: Any):
+        """
+        Overrides UniswapV3LPFixedWidthRunner to check engine is supported.
+        """
+        super().__init__(**data)
+
+        if self.engine not in ["evm", "native"]:
+            raise ValueError("self.engine not one of 'evm', 'native'")
+        if self.engine == "native" and self.state_override:
+            raise ValueError("state override not supported with native engine.")
+
+        for tick_width in self.what_if_tick_widths:
+            if (tick_width // 2) % self._tick_spacing != 0:
+                raise ValueError(f"what if tick width {tick_width} // 2 not a multiple of pool.tickSpacing")
+
+        # @dev what-if rows written after a checkpoint would be duplicated on resume
+        if len(self.what_if_tick_widths) > 0 and self.checkpoint_blocks > 0:
+            raise ValueError("what if tick widths not supported with checkpoints.")
+
+    def setup(self, mocking: bool = True):
+        """
+        Overrides UniswapV3LPFixedWidthRunner to skip mock and backtester deployment
+        in favor of the native engine if engine is "native".
+        """
+        if self.engine != "native":
+            super().setup(mocking=mocking)
+            return
+
+        click.echo("Using native backtester engine ...")
+        self._backtester = UniswapV3LPSimpleEngine()
+        self._initialized = True
+
+    def set_mocks_state(self, state: Mapping):
+        """
+        Overrides UniswapV3LPFixedWidthRunner to pass state straight to
+        the native engine if engine is "native".
+        """
+        if self.engine != "native":
+            super().set_mocks_state(state)
+            return
+
+        self.backtester.set_state(state)
+
+    def _update_backtester(self, number: int):
+        """
+        Establishes position attributes on backtester contract, or native engine,
+        with mocks state set to that of block number.
+        """
+        if self.engine == "native":
+            self.backtester.update(self.tick_lower, self.tick_upper, self.liquidity)
+            ticks = (self.backtester.tick_lower, self.backtester.tick_upper)
+            fee_growth_inside = (self.backtester.fee_growth_inside0_x128, self.backtester.fee_growth_inside1_x128)
+            liquidity = self.backtester.liquidity
+        else:
+            mock_pool = self._mocks["pool"]
+            self.backtester.update(mock_pool.address, self.tick_lower, self.tick_upper, self.liquidity, sender=self.acc)
+            ticks = (self.backtester.tickLower_(), self.backtester.tickUpper_())
+            fee_growth_inside = (self.backtester.feeGrowthInside0X128_(), self.backtester.feeGrowthInside1X128_())
+            liquidity = self.backtester.liquidity_()
+
+        click.echo("Backtester position attributes ...")
+        click.echo(f"ticks: {ticks}")
+        click.echo(f"feeGrowthInside: {fee_growth_inside}")
+        click.echo(f"liquidity: {liquidity}")
+
+        self._block_position_last = number
+        (self._fee_growth_inside0_x128, self._fee_growth_inside1_x128) = fee_growth_inside
+
+    def _restore_position(self):
+        """
+        Overrides UniswapV3LPFixedWidthRunner to re-establish position attributes on backtester
+        with mocks state set to that of the block the position was last updated at,
+        so fees accrue from the same fee growth inside as before the checkpoint.
+        """
+        fee_growth_inside = (self._fee_growth_inside0_x128, self._fee_growth_inside1_x128)
+        number = self._block_position_last
+        self.set_mocks_state(self.get_refs_state(number))
+        self._update_backtester(number)
+
+        if (self._fee_growth_inside0_x128, self._fee_growth_inside1_x128) != fee_growth_inside:
+            raise ValueError("restored fee growth inside does not match checkpoint.")
 
     def _calculate_position_liquidity(self, state: Mapping) -> int:
         """
@@ -33,43 +159,6 @@ class UniswapV3LPSimpleRunner(UniswapV3LPFixedWidthRunner):
             self.amount1,
         )
 
-    def _calculate_position_amounts_after_rebalance(
-        self, state: Mapping, amount0_before: int, amount1_before: int
-    ) -> (int, int):
-        """
-        Calculate position amounts to rebalance to.
-
-        Rebalance condition: price * amount0 == amount1
-
-        Args:
-            state (Mapping): The state of mocks
-        """
-        liquidity = state["liquidity"]
-        price = (int(state["slot0"].sqrtPriceX96) ** 2) / (1 << 192)
-        value1 = int(amount0_before * price + amount1_before)
-        x1 = (liquidity * state["slot0"].sqrtPriceX96) // (1 << 96)
-
-        amount1 = value1 // 2  # (1/2) * (dx * p + dy)
-        dx1 = amount1 - amount1_before  # (1/2) * |dx * p - dy|
-        if dx1 == 0:
-            return (amount0_before, amount1_before)
-
-        # correct for fee and second order slippage terms
-        fee = self._refs["pool"].fee()  # in bps
-        _f = fee / 1e6
-        eps1 = int(-abs(dx1) * (_f / 2 + (1 / 2) * abs(dx1) / x1))
-
-        amount1 += eps1
-        amount0 = int(amount1 / price)  # satisfies rebalance condition
-
-        click.echo("Calculating position amounts after rebalance ...")
-        click.echo(f"Amounts (before): {(amount0_before, amount1_before)}")
-        click.echo(f"Amounts (after): {(amount0, amount1)}")
-        click.echo(f"Value (before): {value1}")
-        click.echo(f"Value (after): {int(amount0 * price + amount1)}")
-
-        return (amount0, amount1)
-
     def snapshot(self) -> (SnapshotID, Mapping):
         """
         Overrides snapshot to include internal fields updated
@@ -86,6 +175,10 @@ class UniswapV3LPSimpleRunner(UniswapV3LPFixedWidthRunner):
         for name in extra_field_names:
             snapshot_runner_kwargs.update({name: getattr(self, name)})
 
+        # @dev native engine state is updated in place so keep a copy to restore
+        if self.engine == "native":
+            snapshot_runner_kwargs.update({"_backtester": copy.copy(self._backtester)})
+
         return (snapshot_chain_id, snapshot_runner_kwargs)
 
     def init_mocks_state(self, number: int, state: Mapping):
@@ -96,8 +189,6 @@ class UniswapV3LPSimpleRunner(UniswapV3LPFixedWidthRunner):
             number (int): The block number at init.
             state (Mapping): The init state of mocks.
         """
-        mock_pool = self._mocks["pool"]
-
         # some setup based off initial state
         tick_lower, tick_upper = self._calculate_lp_ticks(number, state)
         self.tick_lower = tick_lower
@@ -151,15 +242,8 @@ class UniswapV3LPSimpleRunner(UniswapV3LPFixedWidthRunner):
         # set the tick for position manager add liquidity to work properly
         self.set_mocks_state(state)
 
-        # establish position attributes on backtester contract
-        self.backtester.update(mock_pool.address, self.tick_lower, self.tick_upper, self.liquidity, sender=self.acc)
-
-        click.echo("Backtester position attributes ...")
-        click.echo(f"ticks: {(self.backtester.tickLower_(), self.backtester.tickUpper_())}")
-        click.echo(
-            f"feeGrowthInside: {(self.backtester.feeGrowthInside0X128_(), self.backtester.feeGrowthInside1X128_())}"
-        )
-        click.echo(f"liquidity: {self.backtester.liquidity_()}")
+        # establish position attributes on backtester
+        self._update_backtester(number)
 
         # set block as processed
         self._last_number_processed = number
@@ -190,10 +274,12 @@ class UniswapV3LPSimpleRunner(UniswapV3LPFixedWidthRunner):
             self._last_number_processed = number
             return
 
+        click.echo(f"Rebalancing LP position at block {number} ...")
+        self._sync_mocks_state()
+
         self.tick_lower = tick_lower
         self.tick_upper = tick_upper
 
-        click.echo(f"Rebalancing LP position at block {number} ...")
         (amount0, amount1) = self.backtester.principal(state["slot0"].sqrtPriceX96)
         (fees0, fees1) = self.backtester.fees()
 
@@ -210,6 +296,10 @@ class UniswapV3LPSimpleRunner(UniswapV3LPFixedWidthRunner):
         self.amount0 = amount0
         self.amount1 = amount1
 
+        # value what-if candidate tick widths over the coming period before committing to this one
+        if len(self.what_if_tick_widths) > 0:
+            self._what_if(number, state)
+
         # @dev must recalculate liquidity *after* set rebalanced amounts and new upper, lower ticks
         self.liquidity = self._calculate_position_liquidity(state)
 
@@ -222,16 +312,8 @@ class UniswapV3LPSimpleRunner(UniswapV3LPFixedWidthRunner):
         # set the tick for position manager add liquidity to work properly
         self.set_mocks_state(state)
 
-        # establish position attributes on backtester contract
-        mock_pool = self._mocks["pool"]
-        self.backtester.update(mock_pool.address, self.tick_lower, self.tick_upper, self.liquidity, sender=self.acc)
-
-        click.echo("Backtester position attributes ...")
-        click.echo(f"ticks: {(self.backtester.tickLower_(), self.backtester.tickUpper_())}")
-        click.echo(
-            f"feeGrowthInside: {(self.backtester.feeGrowthInside0X128_(), self.backtester.feeGrowthInside1X128_())}"
-        )
-        click.echo(f"liquidity: {self.backtester.liquidity_()}")
+        # establish position attributes on backtester
+        self._update_backtester(number)
 
         # check fee values reset
         click.echo(f"values: {self.backtester.values()}")
@@ -239,3 +321,156 @@ class UniswapV3LPSimpleRunner(UniswapV3LPFixedWidthRunner):
         # set position as rebalanced
         self._block_rebalance_last = number
         self._last_number_processed = number
+
+    def _what_if_end(self, number: int) -> int:
+        """
+        Block the period starting with a rebalance at block number ends at, i.e. the first block
+        processed at or after the next rebalance is due.
+        """
+        kwargs = self._backtest_kwargs
+        step = kwargs["step"]
+        periods = max(-(-self.blocks_between_rebalance // step), 1)
+        return min(number + periods * step, kwargs["stop"])
+
+    def _peek_refs_state(self, number: int) -> Mapping:
+        """
+        Ref state at block number, sharing any prefetch for the block without consuming it.
+        """
+        prefetched = self._prefetch.get(number)
+        if prefetched is None:
+            return self._fetch_refs_state(number, self.tick_lower, self.tick_upper)
+
+        (_, future) = prefetched
+        return future.result()
+
+    def _what_if(self, number: int, state: Mapping):
+        """
+        Values the position rebalanced to each what-if tick width, and the configured one, one period
+        forward from block number, recording the end of period values and regret versus the configured
+        tick width to the what-if table. Each candidate is valued on a branch of the fork snapshotted
+        before and reverted after, or a copy of the native engine, so the backtest continues unchanged.
+
+        Position amounts after rebalance must already be set, as they do not depend on tick width.
+
+        Args:
+            number (int): The block number of the rebalance.
+            state (Mapping): The ref state at block number.
+        """
+        end = self._what_if_end(number)
+        if end <= number:
+            return
+
+        saved = {name: getattr(self, name) for name in self._what_if_names}
+        saved["_mocks_state_last"] = dict(self._mocks_state_last)
+
+        # position ticks of each candidate at rebalance, with configured tick width first
+        tick_widths = [self.tick_width] + [w for w in self.what_if_tick_widths if w != self.tick_width]
+        ticks = []
+        for tick_width in tick_widths:
+            self.tick_width = tick_width
+            ticks.append(self._calculate_lp_ticks(number, state))
+        self.tick_width = saved["tick_width"]
+
+        # tick info for all candidate ticks at start and end of period in one batch per block
+        ticks_all = sorted(set(tick for pair in ticks for tick in pair))
+        calls = [("pool", "ticks", (tick,)) for tick in ticks_all]
+        state_end = self._peek_refs_state(end)
+        tick_infos = {n: dict(zip(ticks_all, self._ref_calls(calls, n))) for n in [number, end]}
+
+        click.echo(f"Valuing what-if tick widths {tick_widths} from block {number} to {end} ...")
+        rows = []
+        for i, (tick_width, (tick_lower, tick_upper)) in enumerate(zip(tick_widths, ticks)):
+            (self.tick_width, self.tick_lower, self.tick_upper) = (tick_width, tick_lower, tick_upper)
+            (state_start, state_stop) = [
+                dict(ref_state, tick_info_lower=tick_infos[n][tick_lower], tick_info_upper=tick_infos[n][tick_upper])
+                for (ref_state, n) in [(state, number), (state_end, end)]
+            ]
+            self.liquidity = self._calculate_position_liquidity(state_start)
+
+            snapshot_id = self._branch()
+            try:
+                self.set_mocks_state(state_start)
+                self._update_backtester(number)
+                values = self._get_backtester_values(state_stop)
+                rows.append(self._what_if_data(number, end, state_stop, values, policy=i == 0))
+            finally:
+                self._unbranch(snapshot_id, saved)
+
+        for row in rows:
+            row["regret"] = row["value"] - rows[0]["value"]
+            self._write_what_if(row)
+
+    def _branch(self) -> Optional[SnapshotID]:
+        """
+        Snapshots the fork, or copies the native engine, before valuing a what-if candidate.
+        """
+        self._what_if_branches += 1
+        if self.engine == "native":
+            self._backtester = copy.copy(self._backtester)
+            return None
+
+        return chain.snapshot()
+
+    def _unbranch(self, snapshot_id: Optional[SnapshotID], saved: Mapping[str, Any]):
+        """
+        Reverts the fork to snapshot_id, if any, and restores runner attributes after valuing a what-if candidate.
+        """
+        if snapshot_id is not None:
+            chain.restore(snapshot_id)
+
+        for name, value in saved.items():
+            setattr(self, name, value)
+        self._mocks_state_last = dict(saved["_mocks_state_last"])
+
+    def _what_if_data(self, number: int, end: int, state: Mapping, values: List[int], policy: bool) -> Dict[str, Any]:
+        """
+        What-if table row for the candidate position being valued, with value in token1.
+        Policy is whether the candidate is the configured tick width.
+        """
+        price = (int(state["slot0"].sqrtPriceX96) ** 2) / (1 << 192)
+        (principal0, principal1, fees0, fees1) = values
+        data = {
+            "number": number,
+            "number_end": end,
+            "tick_width": self.tick_width,
+            "policy": policy,
+            "tick_lower": self.tick_lower,
+            "tick_upper": self.tick_upper,
+            "liquidity": self.liquidity,
+        }
+        for i, value in enumerate(values):
+            data[f"values{i}"] = value
+
+        data["value"] = (principal0 + fees0) * price + principal1 + fees1
+        return data
+
+    def _write_what_if(self, row: Mapping):
+        """
+        Writes the row to the what-if table, opening the what-if sink if needed.
+        """
+        if self._what_if_sink is None:
+            self._what_if_sink = get_record_sink(
+                what_if_path(self._backtest_kwargs["path"]),
+                flush_rows=self.record_flush_rows,
+                flush_seconds=self.record_flush_seconds,
+                int64_columns=["number", "number_end", "tick_width", "tick_lower", "tick_upper"],
+            )
+
+        self._what_if_sink.write(row)
+
+    def _echo_backtest_stats(self):
+        """
+        Overrides UniswapV3LPFixedWidthRunner to also report what-if candidates valued.
+        """
+        super()._echo_backtest_stats()
+        if self._what_if_branches > 0:
+            click.echo(f"What-if candidates valued: {self._what_if_branches}")
+
+    def _close_sink(self):
+        """
+        Overrides UniswapV3LPFixedWidthRunner to also close the what-if sink.
+        """
+        super()._close_sink()
+        if self._what_if_sink is not None:
+            self._what_if_sink.close()
+            self._what_if_sink = None
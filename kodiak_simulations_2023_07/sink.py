@@ -0,0 +1,294 @@
+import os
+import time
+import pandas as pd
+
+from typing import Any, Iterable, List, Mapping, Optional
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def _require_pyarrow():
+    """
+    Raises if optional dependency pyarrow is not installed.
+    """
+    if pa is None:
+        raise ImportError("pyarrow required for arrow record sink. Install with `pip install pyarrow`")
+
+
+# @dev 33 bytes so both uint256 and int256 values fit as signed
+_BIG_INT_BYTES = 33
+
+
+def _big_int_type():
+    """
+    Arrow type big int columns are stored losslessly as, big-endian two's complement bytes.
+    """
+    return pa.binary(_BIG_INT_BYTES)
+
+
+def _to_big_int_bytes(value: int) -> bytes:
+    """
+    Encodes an int as stored in big int columns.
+    """
+    return value.to_bytes(_BIG_INT_BYTES, "big", signed=True)
+
+
+def _from_big_int_bytes(value: bytes) -> int:
+    """
+    Decodes an int stored in big int columns.
+    """
+    return int.from_bytes(value, "big", signed=True)
+
+
+# record sink classes for buffered writes of backtest records
+class RecordSink:
+    """
+    Buffers records and writes them to path in batches, flushing once flush_rows
+    records are buffered or flush_seconds have passed since the last flush.
+
+    Args:
+        append (bool): Whether to append to records already at path, e.g. on resume.
+    """
+
+    def __init__(self, path: str, flush_rows: int = 1000, flush_seconds: float = 60, append: bool = False):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.append = append
+
+        self._rows: List[Mapping] = []
+        self._flushed_at = time.monotonic()
+        self._batches = 0  # batches written to path
+
+    def write(self, row: Mapping):
+        """
+        Buffers the record, flushing if needed.
+
+        Args:
+            row (Mapping): The record keyed by column name.
+        """
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_rows or time.monotonic() - self._flushed_at >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes buffered records to path.
+        """
+        if len(self._rows) > 0:
+            self._write_rows(self._rows)
+            self._rows = []
+            self._batches += 1
+
+        self._flushed_at = time.monotonic()
+
+    def checkpoint(self):
+        """
+        Flushes buffered records and fsyncs path so records survive a crash.
+        """
+        self.flush()
+        if os.path.exists(self.path):
+            fd = os.open(self.path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def size(self) -> int:
+        """
+        Size in bytes of records written to path.
+        """
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def close(self):
+        """
+        Flushes buffered records and releases any open handles.
+        """
+        self.checkpoint()
+
+    def _write_rows(self, rows: List[Mapping]):
+        raise NotImplementedError("_write_rows not implemented.")
+
+
+class CSVRecordSink(RecordSink):
+    """
+    Buffered CSV record sink appending each batch to path.
+    Overwrites any existing file with the first batch unless append.
+    """
+
+    def _write_rows(self, rows: List[Mapping]):
+        mode = "a" if self.append or self._batches > 0 else "w"
+        header = mode == "w" or self.size() == 0
+        df = pd.DataFrame.from_records(rows)
+        df.to_csv(self.path, index=False, mode=mode, header=header)
+
+
+class ArrowRecordSink(RecordSink):
+    """
+    Buffered Arrow IPC stream record sink writing each batch as a record batch message to path.
+    Overwrites any existing file unless append, in which case batches continue the existing stream.
+
+    Int columns not in int64_columns are stored losslessly as 33 byte big-endian two's
+    complement binary, covering all uint256 and int256 values, so X96, X128 values
+    don't go through text. The stream stays readable up to the last
+    flushed batch if the backtest is interrupted.
+
+    Args:
+        int64_columns (Iterable[str]): Int columns known to fit in int64, e.g. number, tick.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_rows: int = 1000,
+        flush_seconds: float = 60,
+        append: bool = False,
+        int64_columns: Iterable[str] = (),
+    ):
+        _require_pyarrow()
+        super().__init__(path, flush_rows, flush_seconds, append)
+        self.int64_columns = set(int64_columns)
+
+        self._schema: Optional[pa.Schema] = None
+        self._file = None
+
+    def _infer_schema(self, row: Mapping) -> "pa.Schema":
+        """
+        Infers schema from the first record.
+        """
+        fields = []
+        for name, value in row.items():
+            if isinstance(value, bool):
+                type_ = pa.bool_()
+            elif isinstance(value, int):
+                type_ = pa.int64() if name in self.int64_columns else _big_int_type()
+            elif isinstance(value, float):
+                type_ = pa.float64()
+            else:
+                type_ = pa.string()
+            fields.append(pa.field(name, type_))
+        return pa.schema(fields)
+
+    def _open(self, row: Mapping):
+        """
+        Opens path for writing, writing the stream schema message unless continuing an existing stream.
+        """
+        if self.append and self.size() > 0:
+            with open(self.path, "rb") as f:
+                self._schema = pa.ipc.open_stream(f).schema
+            self._file = open(self.path, "ab")
+            return
+
+        self._schema = self._infer_schema(row)
+        self._file = open(self.path, "wb")
+        self._file.write(self._schema.serialize().to_pybytes())
+
+    def _write_rows(self, rows: List[Mapping]):
+        if self._file is None:
+            self._open(rows[0])
+
+        arrays = []
+        for field in self._schema:
+            values = [row[field.name] for row in rows]
+            if field.type == _big_int_type():
+                values = [_to_big_int_bytes(v) for v in values]
+            arrays.append(pa.array(values, type=field.type))
+
+        # @dev no end of stream marker written so stream can be continued on resume
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self._schema)
+        self._file.write(batch.serialize().to_pybytes())
+        self._file.flush()
+
+    def close(self):
+        """
+        Flushes buffered records and closes path.
+        """
+        self.checkpoint()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def get_record_sink(path: str, **kwargs: Any) -> RecordSink:
+    """
+    Gets the record sink for the file extension of path: Arrow IPC stream
+    for ".arrow", otherwise CSV.
+
+    Args:
+        path (str): The path to write records to.
+        kwargs (Any): Kwargs to pass to the sink constructor.
+    """
+    if path.endswith(".arrow"):
+        return ArrowRecordSink(path, **kwargs)
+
+    kwargs.pop("int64_columns", None)
+    return CSVRecordSink(path, **kwargs)
+
+
+def _read_table(path: str) -> "pa.Table":
+    """
+    Reads an Arrow IPC stream of records, ignoring any partially written trailing batch.
+    """
+    _require_pyarrow()
+    batches = []
+    with open(path, "rb") as f:
+        reader = pa.ipc.open_stream(f)
+        try:
+            for batch in reader:
+                batches.append(batch)
+        except pa.ArrowInvalid:
+            pass  # @dev ignore partially written trailing batch if interrupted
+
+        return pa.Table.from_batches(batches, schema=reader.schema)
+
+
+def read_records(path: str, big_ints_as_float: bool = False) -> pd.DataFrame:
+    """
+    Reads records written by a record sink. Big int columns from an Arrow
+    stream are returned as Python ints, or as floats if big_ints_as_float.
+
+    Args:
+        path (str): The path records were written to.
+        big_ints_as_float (bool): Whether to convert big int columns to float.
+
+    Returns:
+        :class:`pandas.DataFrame`: The records.
+    """
+    if not path.endswith(".arrow"):
+        return pd.read_csv(path)
+
+    table = _read_table(path)
+    df = table.to_pandas()
+    for field in table.schema:
+        if field.type == _big_int_type():
+            df[field.name] = df[field.name].apply(_from_big_int_bytes)
+            if big_ints_as_float:
+                df[field.name] = df[field.name].apply(float)
+    return df
+
+
+def export_records(path: str, path_out: str):
+    """
+    Exports records written by an Arrow record sink to CSV or Parquet, based on the
+    file extension of path_out. Big ints are written as text to both CSV and Parquet.
+
+    Args:
+        path (str): The path to the arrow file records were written to.
+        path_out (str): The path to export to, ending in ".csv" or ".parquet".
+    """
+    if path_out.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        table = _read_table(path)
+        for i, field in enumerate(table.schema):
+            if field.type == _big_int_type():
+                values = [str(_from_big_int_bytes(v)) for v in table.column(i).to_pylist()]
+                table = table.set_column(i, field.name, pa.array(values, type=pa.string()))
+
+        pq.write_table(table, path_out)
+        return
+
+    read_records(path).to_csv(path_out, index=False)
@@ -0,0 +1,270 @@
+import bisect
+import click
+import hashlib
+import numpy as np
+import os
+
+from typing import List, Optional
+
+from . import math as _math
+from .math import ev
+from .optimize import _delta_bounds, find_optimal_delta, find_optimal_deltas
+
+
+# default grids for dimensionless groups spanned by the lookup surface
+LOG_S_GRID = np.linspace(np.log(1e-3), np.log(1.0), 29)  # log(sigma * sqrt(tau))
+LOG_THETA_GRID = np.linspace(np.log(1e-3), np.log(1e3), 43)  # log(theta / theta_min - 1)
+LOG_EL_GRID = np.linspace(np.log(1e-5), np.log(1.0), 24)  # log(el)
+MU_GRID = np.linspace(-4.0, 4.0, 9)  # mu / sigma**2
+FEE_TIERS = np.array([1e-4, 5e-4, 3e-3, 1e-2])  # ef for univ3 fee tiers, never interpolated across
+
+
+def math_version() -> str:
+    """
+    Version of EV math as the sha256 hash of math.py source.
+    """
+    with open(_math.__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def default_surface_path() -> str:
+    """
+    Default path to the lookup surface built from the current version of math.py.
+    """
+    return f"notebook/results/surface/delta_{math_version()[:12]}.npz"
+
+
+def _coords(mu: float, sigma: float, tau: float, el: float, theta: float) -> Optional[List[float]]:
+    """
+    Dimensionless surface coordinates for the given EV inputs. None if theta <= theta_min.
+    """
+    # @dev optimal delta diverges as theta -> theta_min = (el + 1) * sigma**2 / 8 so measure theta from there
+    theta_min = (el + 1) * sigma**2 / 8
+    if theta <= theta_min or el <= 0:
+        return None
+
+    return [np.log(sigma * np.sqrt(tau)), np.log(theta / theta_min - 1), np.log(el), mu / sigma**2]
+
+
+def _inputs(points: np.ndarray, ef: float) -> List[np.ndarray]:
+    """
+    EV inputs (mu, sigma, tau, ef, el, theta) at tau = 1 for the given surface coordinates
+    stacked along the last axis.
+    """
+    (log_s, log_theta, log_el, mu) = np.moveaxis(points, -1, 0)
+    sigma = np.exp(log_s)
+    el = np.exp(log_el)
+    theta = (el + 1) * sigma**2 * (1 + np.exp(log_theta)) / 8
+    return [mu * sigma**2, sigma, 1, ef, el, theta]
+
+
+class OptimalDeltaSurface:
+    """
+    Tabulated optimal delta and EV over the dimensionless groups
+    (sigma * sqrt(tau), theta / theta_min, el, mu / sigma**2) for each univ3
+    fee tier, with theta_min = (el + 1) * sigma**2 / 8.
+
+    EV depends on (mu, sigma, tau, theta) only through mu * tau, sigma**2 * tau
+    and theta * tau, so the surface is solved at tau = 1. Tabulated optima are
+    bounded below by a single tick; pool tick spacing is applied at query time.
+
+    Queries multilinearly interpolate log(delta) within a grid cell then evaluate
+    EV exactly at the interpolated delta. A cell is trusted only if its corner optima
+    are all interior (not min or full tick width) and interpolation at the cell center
+    reproduces the solved optimum within tolerance. Queries outside the grid or in
+    untrusted cells fall back to find_optimal_delta.
+    """
+
+    def __init__(
+        self,
+        axes: List[np.ndarray],
+        fee_tiers: np.ndarray,
+        log_deltas: np.ndarray,
+        trusted: np.ndarray,
+        version: str,
+        errors: Optional[np.ndarray] = None,
+        quad_order: int = 0,
+    ):
+        self.axes = [np.asarray(axis, dtype=float) for axis in axes]
+        self.fee_tiers = np.asarray(fee_tiers, dtype=float)
+        self.log_deltas = log_deltas  # shape (len(fee_tiers), *[len(axis) for axis in axes])
+        self.trusted = trusted  # shape (len(fee_tiers), *[len(axis) - 1 for axis in axes])
+        self.version = version
+        self.quad_order = quad_order  # quadrature order for psi, 0 for closed-form approx
+        self.errors = errors if errors is not None else np.full(2, np.nan)  # max |d log(delta)|, max |d value|/value
+
+        self._lists = [axis.tolist() for axis in self.axes]
+        self._tiers = {round(ef, 12): i for i, ef in enumerate(self.fee_tiers.tolist())}
+
+    @classmethod
+    def build(
+        cls,
+        axes: Optional[List[np.ndarray]] = None,
+        fee_tiers: Optional[np.ndarray] = None,
+        xtol: float = 5e-2,
+        n_check: int = 10000,
+        seed: int = 0,
+        quad_order: int = 0,
+    ) -> "OptimalDeltaSurface":
+        """
+        Solves for the optimal delta at every grid point and cell center in one batch
+        each with find_optimal_deltas, trusting cells whose interpolated center log(delta)
+        is within xtol of the solved optimum. Then reports the max interpolation error
+        over n_check random points in trusted cells.
+        """
+        if axes is None:
+            axes = [LOG_S_GRID, LOG_THETA_GRID, LOG_EL_GRID, MU_GRID]
+        if fee_tiers is None:
+            fee_tiers = FEE_TIERS
+
+        grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1)
+        centers = np.stack(np.meshgrid(*[(axis[1:] + axis[:-1]) / 2 for axis in axes], indexing="ij"), axis=-1)
+        (_, delta_max) = _delta_bounds(1)
+
+        log_deltas = []
+        trusted = []
+        for ef in fee_tiers:
+            click.echo(f"Solving for optimal delta over {grid[..., 0].size} grid points with fee {ef} ...")
+            (deltas, _, converged) = find_optimal_deltas(*_inputs(grid, ef), 1, quad_order=quad_order)
+            interior = converged & (deltas > np.log(1.0001)) & (deltas < delta_max)
+            log_deltas.append(np.log(deltas))
+
+            # cells with all corners interior
+            cells = interior
+            for i in range(len(axes)):
+                cells = cells[(slice(None),) * i + (slice(0, -1),)] & cells[(slice(None),) * i + (slice(1, None),)]
+            trusted.append(cells)
+
+        surface = cls(
+            axes, fee_tiers, np.stack(log_deltas), np.stack(trusted), math_version(), quad_order=quad_order
+        )
+
+        # check interpolation at cell centers
+        for i, ef in enumerate(fee_tiers):
+            click.echo(f"Checking interpolation over {centers[..., 0].size} cell centers with fee {ef} ...")
+            (deltas, _, _) = find_optimal_deltas(*_inputs(centers, ef), 1, quad_order=quad_order)
+            surface.trusted[i] &= np.abs(surface._interpolate_centers(i) - np.log(deltas)) <= xtol
+
+        click.echo(f"Trusted cells: {surface.trusted.mean()}")
+
+        # estimate interpolation error on random points in trusted cells
+        rng = np.random.default_rng(seed)
+        points = np.stack([rng.uniform(axis[0], axis[-1], n_check) for axis in surface.axes], axis=-1)
+        tiers = rng.integers(len(fee_tiers), size=n_check)
+        approx = [surface._interpolate(i, list(p)) for i, p in zip(tiers, points)]
+        mask = np.array([a is not None for a in approx])
+        if mask.any():
+            approx = np.exp([a for a in approx if a is not None])
+            inputs = _inputs(points[mask], surface.fee_tiers[tiers[mask]])
+            (deltas, vals, _) = find_optimal_deltas(*inputs, 1, quad_order=quad_order)
+            surface.errors = np.array(
+                [
+                    np.max(np.abs(np.log(approx) - np.log(deltas))),
+                    np.max(np.abs(ev(approx, *inputs, quad_order) / 2 - vals) / vals),
+                ]
+            )
+
+        click.echo(f"Max interpolation error in (log(delta), value / value): {tuple(surface.errors)}")
+        return surface
+
+    @classmethod
+    def load(cls, path: str) -> "OptimalDeltaSurface":
+        """
+        Loads surface from .npz file, checking it was built from the current version of math.py.
+        """
+        data = np.load(path)
+        version = str(data["version"])
+        if version != math_version():
+            raise ValueError(f"surface at {path} built from different version of math.py. Rebuild surface.")
+
+        axes = [data[f"axis{i}"] for i in range(data["log_deltas"].ndim - 1)]
+        return cls(
+            axes,
+            data["fee_tiers"],
+            data["log_deltas"],
+            data["trusted"],
+            version,
+            data["errors"],
+            int(data["quad_order"]),
+        )
+
+    def save(self, path: str):
+        """
+        Saves surface to .npz file.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            **{f"axis{i}": axis for i, axis in enumerate(self.axes)},
+            fee_tiers=self.fee_tiers,
+            log_deltas=self.log_deltas,
+            trusted=self.trusted,
+            errors=self.errors,
+            quad_order=self.quad_order,
+            version=np.array(self.version),
+        )
+
+    def _interpolate_centers(self, tier: int) -> np.ndarray:
+        """
+        Multilinear interpolation of log(delta) at all cell centers for given fee tier.
+        """
+        block = self.log_deltas[tier]
+        for i in range(len(self.axes)):
+            lower = block[(slice(None),) * i + (slice(0, -1),)]
+            upper = block[(slice(None),) * i + (slice(1, None),)]
+            block = (lower + upper) / 2
+        return block
+
+    def _interpolate(self, tier: int, x: List[float]) -> Optional[np.ndarray]:
+        """
+        Multilinear interpolation of log(delta) at surface coordinates x
+        for given fee tier. None if x outside the grid or in an untrusted cell.
+        """
+        cell = [tier]
+        weights = []
+        for axis, xi in zip(self._lists, x):
+            if not axis[0] <= xi <= axis[-1]:
+                return None
+
+            i = min(bisect.bisect_right(axis, xi) - 1, len(axis) - 2)
+            cell.append(i)
+            weights.append((xi - axis[i]) / (axis[i + 1] - axis[i]))
+
+        if not self.trusted[tuple(cell)]:
+            return None
+
+        # contract the 2**n corner block one axis at a time
+        block = self.log_deltas[(tier,) + tuple(slice(i, i + 2) for i in cell[1:])]
+        for t in weights:
+            block = block[0] * (1 - t) + block[1] * t
+
+        return block
+
+    def query(
+        self,
+        mu: float,
+        sigma: float,
+        tau: float,
+        ef: float,
+        el: float,
+        theta: float,
+        tick_spacing: float,
+    ) -> (float, float):
+        """
+        Looks up optimal delta and EV at the optimal delta, with the same
+        inputs and returns as find_optimal_delta.
+
+        Falls back to find_optimal_delta outside the trusted domain of the surface.
+        """
+        tier = self._tiers.get(round(ef, 12))
+        x = _coords(mu, sigma, tau, el, theta)
+        log_delta = self._interpolate(tier, x) if tier is not None and x is not None else None
+        if log_delta is None:
+            return find_optimal_delta(mu, sigma, tau, ef, el, theta, tick_spacing, quad_order=self.quad_order)
+
+        # clip to pool tick spacing bounds
+        # @dev EV concave about the interior optimum so the clipped delta is the constrained optimum
+        (delta_min, delta_max) = _delta_bounds(tick_spacing)
+        delta = min(max(float(np.exp(log_delta)), delta_min), delta_max)
+        value = ev(delta, mu, sigma, tau, ef, el, theta, self.quad_order) / 2
+        return (delta, float(value))
@@ -0,0 +1,224 @@
+import atexit
+import click
+import itertools
+import multiprocessing
+import os
+
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .checkpoint import checkpoint_path, read_checkpoint
+
+
+# runner kwargs swept over in the grid
+SWEEP_FIELDS = ["tick_width", "blocks_between_rebalance", "compound_fees_at_rebalance"]
+
+# per worker process port of its local fork
+_port: Optional[int] = None
+
+
+def get_result_path(
+    runner_cls_name: str,
+    pool_addr: str,
+    tick_width: int,
+    blocks_between_rebalance: int,
+    start: int,
+    stop: int,
+    step: int,
+    ext: str = "csv",
+) -> str:
+    """
+    Path to write backtest records to, as named by scripts/backtester.py.
+
+    Returns:
+        str: The path to the results file.
+    """
+    name = f"{runner_cls_name}_{pool_addr}_{tick_width}_{blocks_between_rebalance}_{start}_{stop}_{step}.{ext}"
+    return os.path.join("notebook", "results", "backtest", name)
+
+
+def expand_grid(
+    runner_cls_names: Sequence[str],
+    grid: Mapping[str, Sequence[Any]],
+    block_ranges: Sequence[Tuple[int, int, int]],
+) -> List[Dict[str, Any]]:
+    """
+    Expands a grid of runner kwargs into a job for every combination.
+
+    Args:
+        runner_cls_names (Sequence[str]): The runner class names to sweep.
+        grid (Mapping[str, Sequence[Any]]): Values to sweep for each runner kwarg, e.g.
+            tick_width, blocks_between_rebalance, compound_fees_at_rebalance.
+        block_ranges (Sequence[Tuple[int, int, int]]): The (start, stop, step) of each backtest.
+
+    Returns:
+        List[Dict[str, Any]]: The jobs, with keys runner, kwargs, start, stop, step.
+    """
+    names = list(grid.keys())
+    jobs = []
+    for runner_cls_name, values, (start, stop, step) in itertools.product(
+        runner_cls_names, itertools.product(*[grid[name] for name in names]), block_ranges
+    ):
+        jobs.append(
+            {
+                "runner": runner_cls_name,
+                "kwargs": dict(zip(names, values)),
+                "start": start,
+                "stop": stop,
+                "step": step,
+            }
+        )
+    return jobs
+
+
+def _init_worker(network_choice: str, ports: multiprocessing.Queue):
+    """
+    Connects the worker process to its own local fork on a port distinct from other workers.
+    """
+    global _port
+    from ape import networks
+
+    _port = ports.get()
+    provider_settings = {"host": f"http://127.0.0.1:{_port}"}
+
+    # @dev kept connected for the life of the worker, disconnecting on exit
+    provider_context = networks.parse_network_choice(network_choice, provider_settings=provider_settings)
+    provider_context.__enter__()
+    atexit.register(provider_context.__exit__, None, None, None)
+    click.echo(f"Worker {os.getpid()} connected to fork on port {_port}.")
+
+
+def _run_job(job: Mapping[str, Any], base_kwargs: Mapping[str, Any], ext: str, attempt: int) -> str:
+    """
+    Runs the backtest for job on the worker fork. The first attempt starts fresh, discarding any records and
+    checkpoint at the result path, while retries resume from the checkpoint a prior attempt left, if any.
+    Runners reuse mocks deployed by prior jobs on the worker fork unless base kwarg reuse_mocks is False.
+
+    Returns:
+        str: The path records were written to.
+    """
+    import kodiak_simulations_2023_07
+
+    runner_cls = getattr(kodiak_simulations_2023_07, job["runner"])
+    kwargs = {"reuse_mocks": True, **base_kwargs, **job["kwargs"]}
+    runner = runner_cls(**kwargs)
+
+    (start, stop, step) = (job["start"], job["stop"], job["step"])
+    path = get_result_path(
+        job["runner"],
+        runner._refs["pool"].address,
+        runner.tick_width,
+        runner.blocks_between_rebalance,
+        start,
+        stop,
+        step,
+        ext,
+    )
+
+    path_checkpoint = checkpoint_path(path)
+    if attempt > 0 and os.path.exists(path_checkpoint):
+        click.echo(f"Worker {os.getpid()} resuming {path} from checkpoint ...")
+        runner = runner_cls(**read_checkpoint(path_checkpoint)["fields"])
+        runner.resume(path_checkpoint)
+        return path
+
+    for p in [path, path_checkpoint]:
+        if os.path.exists(p):
+            os.remove(p)
+
+    click.echo(f"Worker {os.getpid()} running {path} ...")
+    runner.backtest(path, start, stop if stop >= 0 else None, step)
+    return path
+
+
+def sweep(
+    jobs: Sequence[Mapping[str, Any]],
+    base_kwargs: Mapping[str, Any],
+    network_choice: str = "ethereum:mainnet-fork:foundry",
+    max_workers: int = 4,
+    port: int = 8546,
+    retries: int = 2,
+    ext: str = "csv",
+) -> Tuple[List[str], List[Mapping[str, Any]]]:
+    """
+    Runs backtest jobs in a process pool, with each worker connected to its own local fork
+    node on ports port, port + 1, ..., port + max_workers - 1.
+
+    Records of each job are written to get_result_path. Workers should share a ref call cache
+    through base kwarg cache_path, since the cache is safe to share across processes. Failed jobs
+    are retried up to retries times, resuming from the last checkpoint if base kwarg
+    checkpoint_blocks > 0.
+
+    Args:
+        jobs (Sequence[Mapping[str, Any]]): The jobs to run, from expand_grid.
+        base_kwargs (Mapping[str, Any]): Runner kwargs common to all jobs, e.g. amount1, cache_path.
+        network_choice (str): The network choice each worker connects to.
+        max_workers (int): The number of worker processes and local forks.
+        port (int): The port of the first worker fork.
+        retries (int): The max number of times to retry a failed job.
+        ext (str): The record format, "csv" or "arrow".
+
+    Returns:
+        completed (List[str]): The paths records of completed jobs were written to.
+        failed (List[Mapping[str, Any]]): The jobs that failed after all retries.
+    """
+    # @dev compound_fees_at_rebalance not in result file name so jobs must differ in other fields
+    keys = set()
+    for job in jobs:
+        kwargs = dict(base_kwargs, **job["kwargs"])
+        key = tuple(
+            [job["runner"], repr(kwargs.get("ref_addrs")), job["start"], job["stop"], job["step"]]
+            + [kwargs.get(name) for name in ["tick_width", "blocks_between_rebalance"]]
+        )
+        if key in keys:
+            raise ValueError(f"job {job} writes to the same result path as another job")
+        keys.add(key)
+
+    # @dev spawn so workers don't inherit the parent provider connection
+    ctx = multiprocessing.get_context("spawn")
+    click.echo(f"Sweeping {len(jobs)} backtests over {max_workers} workers ...")
+    with ctx.Manager() as manager:
+        ports = manager.Queue()
+        for i in range(max_workers):
+            ports.put(port + i)
+
+        with ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=ctx, initializer=_init_worker, initargs=(network_choice, ports)
+        ) as executor:
+            return _run_jobs(executor, jobs, base_kwargs, retries, ext)
+
+
+def _run_jobs(
+    executor: ProcessPoolExecutor,
+    jobs: Sequence[Mapping[str, Any]],
+    base_kwargs: Mapping[str, Any],
+    retries: int,
+    ext: str,
+) -> Tuple[List[str], List[Mapping[str, Any]]]:
+    """
+    Submits jobs to executor, resubmitting failed jobs up to retries times.
+    """
+    completed = []
+    failed = []
+    attempts: Dict[Future, Tuple[Mapping[str, Any], int]] = {
+        executor.submit(_run_job, job, base_kwargs, ext, 0): (job, 0) for job in jobs
+    }
+    while len(attempts) > 0:
+        (done, _) = wait(attempts, return_when=FIRST_COMPLETED)
+        for future in done:
+            (job, attempt) = attempts.pop(future)
+            try:
+                path = future.result()
+            except Exception as err:
+                if attempt < retries:
+                    click.echo(f"Job {job} failed with {err!r}. Retrying ...")
+                    attempts[executor.submit(_run_job, job, base_kwargs, ext, attempt + 1)] = (job, attempt + 1)
+                else:
+                    click.echo(f"Job {job} failed with {err!r} after {attempt + 1} attempts.")
+                    failed.append(job)
+                continue
+
+            click.echo(f"Completed {path}. {len(completed) + 1} of {len(jobs)} done.")
+            completed.append(path)
+
+    return (completed, failed)
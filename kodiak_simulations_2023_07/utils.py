@@ -1,6 +1,152 @@
+import numpy as np
+import numpy.typing as npt
+
+from functools import lru_cache
+
+from .constants import MAX_SQRT_RATIO, MAX_TICK, MIN_SQRT_RATIO, MIN_TICK
+
+
+# TickMath.getSqrtRatioAtTick multipliers 1 / sqrt(1.0001)**(2**i) in Q128 for each bit i of abs(tick)
+_TICK_BIT_RATIOS_X128 = [
+    0xFFF97272373D413259A46990580E213A,
+    0xFFF2E50F5F656932EF12357CF3C7FDCC,
+    0xFFE5CACA7E10E4E61C3624EAA0941CD0,
+    0xFFCB9843D60F6159C9DB58835C926644,
+    0xFF973B41FA98C081472E6896DFB254C0,
+    0xFF2EA16466C96A3843EC78B326B52861,
+    0xFE5DEE046A99A2A811C461F1969C3053,
+    0xFCBE86C7900A88AEDCFFC83B479AA3A4,
+    0xF987A7253AC413176F2B074CF7815E54,
+    0xF3392B0822B70005940C7A398E4B70F3,
+    0xE7159475A2C29B7443B29C7FA6E889D9,
+    0xD097F3BDFD2022B8845AD8F792AA5825,
+    0xA9F746462D870FDF8A65DC1F90E061E5,
+    0x70D869A156D2A1B890BB3DF62BAF32F7,
+    0x31BE135F97D08FD981231505542FCFA6,
+    0x9AA508B5B7A84E1C677DE54F3E99BC9,
+    0x5D6AF8DEDB81196699C329225EE604,
+    0x2216E584F5FA1EA926041BEDFE98,
+    0x48A170391F7DC42444E8FA2,
+]
+_TICK_BIT0_RATIO_X128 = 0xFFFCB933BD6FAD37AA2D162D1A594001
+_UINT256_MAX = (1 << 256) - 1
+
+
 # uni v3 utility functions
+@lru_cache(maxsize=None)
 def get_sqrt_ratio_at_tick(tick: int) -> int:
-    return int(((1.0001 ** (tick)) ** (1 / 2)) * (1 << 96))
+    """
+    Bit-exact port of TickMath.getSqrtRatioAtTick.
+    """
+    abs_tick = abs(tick)
+    assert abs_tick <= MAX_TICK, "T"
+
+    ratio = _TICK_BIT0_RATIO_X128 if abs_tick & 0x1 != 0 else 1 << 128
+    for i, r in enumerate(_TICK_BIT_RATIOS_X128):
+        if abs_tick & (1 << (i + 1)) != 0:
+            ratio = (ratio * r) >> 128
+
+    if tick > 0:
+        ratio = _UINT256_MAX // ratio
+
+    # round up when converting from Q128 to Q96
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+
+def get_tick_at_sqrt_ratio(sqrt_ratio_x96: int) -> int:
+    """
+    Port of TickMath.getTickAtSqrtRatio, returning the greatest tick with
+    get_sqrt_ratio_at_tick(tick) <= sqrt_ratio_x96.
+    """
+    assert sqrt_ratio_x96 >= MIN_SQRT_RATIO and sqrt_ratio_x96 < MAX_SQRT_RATIO, "R"
+
+    # @dev float estimate is within a tick so correct with exact integer comparisons
+    tick = int(np.floor(2 * (np.log(float(sqrt_ratio_x96)) - 96 * np.log(2)) / np.log(1.0001)))
+    tick = min(max(tick, MIN_TICK), MAX_TICK - 1)
+    while tick > MIN_TICK and get_sqrt_ratio_at_tick(tick) > sqrt_ratio_x96:
+        tick -= 1
+    while tick < MAX_TICK - 1 and get_sqrt_ratio_at_tick(tick + 1) <= sqrt_ratio_x96:
+        tick += 1
+
+    return tick
+
+
+def _as_ints(values: npt.ArrayLike) -> np.ndarray:
+    """
+    Converts values (e.g. a column of uint160 or uint256 read from csv) to an object array of python ints.
+    """
+    return np.asarray(np.frompyfunc(int, 1, 1)(np.asarray(values, dtype=object)), dtype=object)
+
+
+def get_sqrt_ratios_at_ticks(ticks: npt.ArrayLike) -> np.ndarray:
+    """
+    Vectorized get_sqrt_ratio_at_tick over an array of ticks.
+
+    Returns:
+        np.ndarray: Object array of sqrtPriceX96 python ints
+    """
+    ticks = np.asarray(ticks, dtype=np.int64)
+    assert np.all(np.abs(ticks) <= MAX_TICK), "T"
+
+    abs_ticks = np.abs(ticks)
+    ratios = np.full(ticks.shape, 1 << 128, dtype=object)
+    ratios[abs_ticks & 0x1 != 0] = _TICK_BIT0_RATIO_X128
+    for i, r in enumerate(_TICK_BIT_RATIOS_X128):
+        mask = abs_ticks & (1 << (i + 1)) != 0
+        ratios[mask] = (ratios[mask] * r) >> 128
+
+    mask = ticks > 0
+    ratios[mask] = _UINT256_MAX // ratios[mask]
+    return (ratios >> 32) + (ratios % (1 << 32) != 0).astype(object)
+
+
+def get_ticks_at_sqrt_ratios(sqrt_ratios_x96: npt.ArrayLike) -> np.ndarray:
+    """
+    Vectorized get_tick_at_sqrt_ratio over an array of sqrtPriceX96 values.
+    """
+    sqrt_ratios_x96 = _as_ints(sqrt_ratios_x96)
+    assert np.all((sqrt_ratios_x96 >= MIN_SQRT_RATIO) & (sqrt_ratios_x96 < MAX_SQRT_RATIO)), "R"
+
+    # float estimates then exact corrections against the sqrt ratios at the estimated ticks
+    logs = np.array([np.log(float(x)) for x in np.ravel(sqrt_ratios_x96)]).reshape(sqrt_ratios_x96.shape)
+    ticks = np.floor(2 * (logs - 96 * np.log(2)) / np.log(1.0001)).astype(np.int64)
+    ticks = np.clip(ticks, MIN_TICK, MAX_TICK - 1)
+    for _ in range(2):
+        ticks = np.where(get_sqrt_ratios_at_ticks(ticks) > sqrt_ratios_x96, np.maximum(ticks - 1, MIN_TICK), ticks)
+        ticks = np.where(
+            get_sqrt_ratios_at_ticks(np.minimum(ticks + 1, MAX_TICK)) <= sqrt_ratios_x96,
+            np.minimum(ticks + 1, MAX_TICK - 1),
+            ticks,
+        )
+
+    return ticks
+
+
+@lru_cache(maxsize=None)
+def get_sqrt_ratio_table(tick_spacing: int) -> (int, np.ndarray):
+    """
+    Table of sqrtPriceX96 at every usable tick for the given pool tick spacing.
+
+    Returns:
+        tick_min (int): Min usable tick, at index 0 of the table
+        table (np.ndarray): Object array of sqrtPriceX96 with table[i] at tick_min + i * tick_spacing
+    """
+    tick_min = MIN_TICK + (-MIN_TICK % tick_spacing)
+    tick_max = MAX_TICK - (MAX_TICK % tick_spacing)
+    table = get_sqrt_ratios_at_ticks(np.arange(tick_min, tick_max + 1, tick_spacing))
+    table.flags.writeable = False
+    return (tick_min, table)
+
+
+def lookup_sqrt_ratios_at_ticks(ticks: npt.ArrayLike, tick_spacing: int) -> np.ndarray:
+    """
+    get_sqrt_ratios_at_ticks for ticks that are multiples of tick_spacing, via the precomputed table.
+    """
+    ticks = np.asarray(ticks, dtype=np.int64)
+    assert np.all(ticks % tick_spacing == 0), "ticks not multiples of tick spacing"
+
+    (tick_min, table) = get_sqrt_ratio_table(tick_spacing)
+    return table[(ticks - tick_min) // tick_spacing]
 
 
 def get_amount0_for_liquidity(sqrt_ratio_a_x96: int, sqrt_ratio_b_x96: int, liquidity: int) -> int:
@@ -38,3 +184,58 @@ def get_liquidity_for_amounts(
     liquidity0 = get_liquidity_for_amount0(sqrt_ratio_x96, sqrt_ratio_b_x96, amount0)
     liquidity1 = get_liquidity_for_amount1(sqrt_ratio_a_x96, sqrt_ratio_x96, amount1)
     return liquidity0 if liquidity0 < liquidity1 else liquidity1
+
+
+def get_amounts_for_liquidities(
+    sqrt_ratio_x96: npt.ArrayLike,
+    sqrt_ratio_a_x96: npt.ArrayLike,
+    sqrt_ratio_b_x96: npt.ArrayLike,
+    liquidity: npt.ArrayLike,
+) -> (np.ndarray, np.ndarray):
+    """
+    Vectorized LiquidityAmounts.getAmountsForLiquidity over columns of Q96 values,
+    including prices outside of [sqrt_ratio_a_x96, sqrt_ratio_b_x96].
+
+    Returns:
+        amount0 (np.ndarray): Object array of amount0 python ints
+        amount1 (np.ndarray): Object array of amount1 python ints
+    """
+    (p, a, b, liquidity) = np.broadcast_arrays(
+        *[_as_ints(v) for v in (sqrt_ratio_x96, sqrt_ratio_a_x96, sqrt_ratio_b_x96, liquidity)]
+    )
+    (a, b) = (np.minimum(a, b), np.maximum(a, b))
+
+    # clamp price to range so one set of formulas covers all three cases
+    p = np.minimum(np.maximum(p, a), b)
+    amount0 = (((liquidity << 96) * (b - p)) // b) // p
+    amount1 = (liquidity * (p - a)) >> 96
+    return (amount0, amount1)
+
+
+def get_liquidities_for_amounts(
+    sqrt_ratio_x96: npt.ArrayLike,
+    sqrt_ratio_a_x96: npt.ArrayLike,
+    sqrt_ratio_b_x96: npt.ArrayLike,
+    amount0: npt.ArrayLike,
+    amount1: npt.ArrayLike,
+) -> np.ndarray:
+    """
+    Vectorized LiquidityAmounts.getLiquidityForAmounts over columns of Q96 values,
+    including prices outside of [sqrt_ratio_a_x96, sqrt_ratio_b_x96].
+
+    Returns:
+        np.ndarray: Object array of liquidity python ints
+    """
+    (p, a, b, amount0, amount1) = np.broadcast_arrays(
+        *[_as_ints(v) for v in (sqrt_ratio_x96, sqrt_ratio_a_x96, sqrt_ratio_b_x96, amount0, amount1)]
+    )
+    (a, b) = (np.minimum(a, b), np.maximum(a, b))
+    below = p <= a
+    above = p >= b
+
+    # @dev liquidity from amount0 over [max(p, a), b] and from amount1 over [a, min(p, b)]
+    p0 = np.where(below, a, p)
+    p1 = np.where(above, b, p)
+    liquidity0 = np.where(above, 0, (amount0 * ((p0 * b) >> 96)) // np.where(above, 1, b - p0))
+    liquidity1 = np.where(below, 0, (amount1 << 96) // np.where(below, 1, p1 - a))
+    return np.where(below, liquidity0, np.where(above, liquidity1, np.minimum(liquidity0, liquidity1)))
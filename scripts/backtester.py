@@ -6,6 +6,9 @@ from ast import literal_eval
 from ape import networks
 from typing_inspect import get_origin
 
+from kodiak_simulations_2023_07.checkpoint import checkpoint_path, read_checkpoint
+from kodiak_simulations_2023_07.sweep import get_result_path
+
 
 def main():
     """
@@ -22,6 +25,15 @@ def main():
     if network_name != "mainnet-fork":
         raise ValueError("not connected to mainnet-fork.")
 
+    # resume from checkpoint if user wants
+    if click.confirm("Resume backtest from checkpoint?", default=False):
+        path = click.prompt("Checkpoint path", type=click.Path(exists=True, dir_okay=False))
+        checkpoint = read_checkpoint(path)
+        runner_cls = getattr(kodiak_simulations_2023_07, checkpoint["runner"])
+        runner = runner_cls(**checkpoint["fields"])
+        runner.resume(path)
+        return
+
     # prompt user which backtest runner to use
     runner_cls_name = click.prompt(
         "Runner type", type=click.Choice(kodiak_simulations_2023_07.__all__, case_sensitive=False)
@@ -67,11 +79,15 @@ def main():
     start = click.prompt("Start block number", type=int)
     stop = click.prompt("Stop block number", type=int, default=-1)
     step = click.prompt("Step size", type=int, default=1)
+    ext = click.prompt("Record format", type=click.Choice(["csv", "arrow"], case_sensitive=False), default="csv")
 
     # remove file if already exists at path
-    path = f"notebook/results/backtest/{runner_cls_name}_{pool_addr}_{runner.tick_width}_{runner.blocks_between_rebalance}_{start}_{stop}_{step}.csv"
-    if os.path.exists(path):
-        os.remove(path)
+    path = get_result_path(
+        runner_cls_name, pool_addr, runner.tick_width, runner.blocks_between_rebalance, start, stop, step, ext
+    )
+    for p in [path, checkpoint_path(path)]:
+        if os.path.exists(p):
+            os.remove(p)
 
     if stop < 0:
         stop = None
@@ -3,7 +3,9 @@ import numpy as np
 import pandas as pd
 
 from ape import Contract, chain, networks
-from kodiak_simulations_2023_07.optimize import find_optimal_delta
+from kodiak_simulations_2023_07.constants import MAX_TICK
+from kodiak_simulations_2023_07.optimize import find_optimal_delta, find_optimal_tau_delta
+from kodiak_simulations_2023_07.surface import OptimalDeltaSurface
 
 
 def main():
@@ -13,6 +15,9 @@ def main():
       - Rebalance period (tau)
       - Liquidity to deploy in pool (l)
 
+    Optionally optimizes the rebalance period jointly with tick width
+    by maximizing EV yield per unit time.
+
     Assumes GBM for underlying price process.
     """
     # echo provider setup
@@ -49,7 +54,9 @@ def main():
     click.echo(f"Pool tick spacing in natural log terms (delta_min): {delta_min}")
 
     # get avg fee revenues over last rebalance period
-    tau = click.prompt("Rebalance period in blocks (tau)", type=int)
+    # @dev if optimizing rebalance period, avg fees over lookback of the same number of blocks
+    joint = click.confirm("Optimize rebalance period (tau) jointly with tick width?", default=False)
+    tau = click.prompt("Rebalance period in blocks (tau)" if not joint else "Lookback for avg fees in blocks", type=int)
 
     fee_growth0_x128_start = pool.feeGrowthGlobal0X128(block_identifier=block_number - tau)
     fee_growth0_x128_end = pool.feeGrowthGlobal0X128(block_identifier=block_number)
@@ -88,8 +95,47 @@ def main():
         if not click.confirm("Proceed anyway?"):
             return
 
-    click.echo("Optimizing EV with respect to tick width ...")
-    (delta, value) = find_optimal_delta(mu, sigma, tau, ef, el, theta, tick_spacing)
+    # ask user whether to integrate expected fees exactly
+    quad_order = click.prompt(
+        "Quadrature order for exact expected fees (0 for closed-form approx)", type=int, default=0
+    )
+
+    if joint:
+        # ask user for range of rebalance periods to consider
+        tau_min = click.prompt("Min rebalance period in blocks", type=int, default=300)
+        tau_max = click.prompt("Max rebalance period in blocks", type=int, default=216000)
+        num = click.prompt("Number of rebalance periods to consider", type=int, default=100)
+        taus = np.unique(np.geomspace(tau_min, tau_max, num).astype(int))
+        deltas = np.geomspace(max(delta_min, np.log(1.0001)), np.log(1.0001**MAX_TICK), 256)
+
+        click.echo("Optimizing EV per unit time with respect to rebalance period and tick width ...")
+        (tau, delta, rate, rates) = find_optimal_tau_delta(
+            mu, sigma, ef, el, theta, tick_spacing, taus, deltas, quad_order
+        )
+        tau = int(tau)
+        value = 1 + rate * tau
+        click.echo(f"Optimal rebalance period (tau): {tau}")
+        click.echo(f"Expected yield per block at optimal tick width and rebalance period: {rate}")
+
+        # save surface to csv for plotting
+        path = f"notebook/results/optimize/surface_{pool_addr}_{block_number}_{amount1}.csv"
+        (tau_grid, delta_grid) = np.meshgrid(taus, deltas, indexing="ij")
+        data = {"tau": tau_grid.ravel(), "delta": delta_grid.ravel(), "rate": rates.ravel()}
+        df = pd.DataFrame(data=data)
+        df.to_csv(path, index=False)
+        click.echo(f"EV per unit time surface saved: {path}")
+    else:
+        # ask user for precomputed optimal delta surface to look up from
+        # @dev use surface.py script to build
+        surface_path = click.prompt("Path to optimal delta surface (blank to solve exactly)", type=str, default="")
+        click.echo("Optimizing EV with respect to tick width ...")
+        if surface_path == "":
+            (delta, value) = find_optimal_delta(mu, sigma, tau, ef, el, theta, tick_spacing, quad_order=quad_order)
+        else:
+            surface = OptimalDeltaSurface.load(surface_path)
+            if surface.quad_order != quad_order:
+                raise ValueError("surface quad_order != quad_order")
+            (delta, value) = surface.query(mu, sigma, tau, ef, el, theta, tick_spacing)
 
     y = value - 1
     click.echo(f"Optimal tick width (delta): {delta}")
@@ -0,0 +1,36 @@
+import click
+import os
+
+from kodiak_simulations_2023_07.surface import OptimalDeltaSurface, default_surface_path
+
+
+@click.group()
+def cli():
+    """
+    Optimal delta lookup surface scripts.
+
+    Surfaces are versioned by the hash of math.py so must be rebuilt
+    when the EV math changes.
+    """
+    pass
+
+
+@cli.command()
+@click.option("--path", type=str, default=None, help="Path to write surface .npz file")
+@click.option("--xtol", type=float, default=5e-2, help="Max log(delta) interpolation error at cell centers")
+@click.option("--quad-order", type=int, default=0, help="Quadrature order for exact psi (0 for closed-form approx)")
+@click.option("--force", is_flag=True, help="Rebuild even if surface exists at path")
+def build(path, xtol, quad_order, force):
+    """
+    Builds optimal delta lookup surface from current version of math.py.
+    """
+    if path is None:
+        path = default_surface_path()
+
+    if os.path.exists(path) and not force:
+        click.echo(f"Surface already exists at {path}. Use --force to rebuild.")
+        return
+
+    surface = OptimalDeltaSurface.build(xtol=xtol, quad_order=quad_order)
+    surface.save(path)
+    click.echo(f"Surface saved: {path}")
@@ -0,0 +1,89 @@
+import click
+import kodiak_simulations_2023_07
+
+from ast import literal_eval
+from ape import networks
+from typing_inspect import get_origin
+
+from kodiak_simulations_2023_07.sweep import SWEEP_FIELDS, expand_grid, sweep
+
+
+def main():
+    """
+    Main parallel parameter sweep script. Each worker backtests on its own local fork.
+    """
+    # fail if not mainnet-fork
+    network_name = networks.provider.network.name
+    if network_name != "mainnet-fork":
+        raise ValueError("not connected to mainnet-fork.")
+
+    network_choice = f"{networks.provider.network.ecosystem.name}:{network_name}:{networks.provider.name}"
+    click.echo(f"Workers will connect to local forks of provider network {network_choice}.")
+
+    # prompt user which backtest runners to sweep
+    runner_cls_names = click.prompt(
+        "Runner types, e.g. ['UniswapV3LPSimpleRunner']",
+        type=str,
+        default=str(["UniswapV3LPSimpleRunner"]),
+    )
+    runner_cls_names = literal_eval(runner_cls_names)
+    for runner_cls_name in runner_cls_names:
+        if runner_cls_name not in kodiak_simulations_2023_07.__all__:
+            raise ValueError(f"runner type {runner_cls_name} not in {kodiak_simulations_2023_07.__all__}")
+
+    runner_cls = getattr(kodiak_simulations_2023_07, runner_cls_names[0])
+
+    # prompt user for values of runner kwargs to sweep
+    grid = {}
+    for name in SWEEP_FIELDS:
+        field = runner_cls.__fields__[name]
+        value = click.prompt(f"Runner kwarg ({name}) values to sweep", type=str, default=str([field.default]))
+        grid[name] = literal_eval(value)
+
+    # prompt user for fields common to all runners
+    skip_names = ["tick_lower", "tick_upper", "liquidity", "amount0", "amount1", "reuse_mocks"] + SWEEP_FIELDS
+    base_kwargs = {}
+    for name, field in runner_cls.__fields__.items():
+        if name in skip_names:
+            continue
+
+        # default to str if not base type
+        type_origin = get_origin(field.annotation)
+        type_ = field.annotation if type_origin is None else str
+
+        # confirm prompt if Optional
+        if field.default is None:
+            if not click.confirm(f"Runner kwarg ({name}) defaults to None. Do you want to input a value?"):
+                base_kwargs[name] = field.default
+                continue
+
+        value = click.prompt(f"Runner kwarg ({name})", default=field.default, type=type_)
+
+        # parse field value from str if not base type
+        if type_origin is not None:
+            value = literal_eval(value)
+
+        base_kwargs[name] = value
+
+    liq_input = click.prompt(
+        "Input amount0, amount1, or liquidity?",
+        type=click.Choice(["liquidity", "amount0", "amount1"], case_sensitive=False),
+    )
+    base_kwargs[liq_input] = click.prompt(f"{liq_input}", default=0, type=int)
+
+    # prompt user for block ranges and sweep setup
+    block_ranges = literal_eval(click.prompt("Block ranges, e.g. [(start, stop, step)]", type=str))
+    ext = click.prompt("Record format", type=click.Choice(["csv", "arrow"], case_sensitive=False), default="csv")
+    max_workers = click.prompt("Number of workers", type=int, default=4)
+    port = click.prompt("Port of first worker fork", type=int, default=8546)
+    retries = click.prompt("Max retries per job", type=int, default=2)
+
+    # run sweep
+    jobs = expand_grid(runner_cls_names, grid, block_ranges)
+    (completed, failed) = sweep(
+        jobs, base_kwargs, network_choice=network_choice, max_workers=max_workers, port=port, retries=retries, ext=ext
+    )
+
+    click.echo(f"Sweep completed {len(completed)} of {len(jobs)} backtests.")
+    for job in failed:
+        click.echo(f"Failed: {job}")